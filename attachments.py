@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Gmail attachment helpers
+Finds attachment parts in a message and streams attachment bodies to disk
+with incremental base64url decoding, so memory stays bounded for large files.
+Outgoing messages with attachments are written the same way: each file is
+base64-encoded chunk by chunk into a MIME stream.
+"""
+
+import base64
+import copy
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import secrets
+import tempfile
+import threading
+from email.mime.base import MIMEBase
+from email.mime.text import MIMEText
+from email.message import Message
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+
+# Default directory for downloaded attachments
+ATTACHMENTS_DIR = 'attachments'
+
+# Manifest of completed downloads, kept inside the download directory
+MANIFEST_FILE = '.attachments.json'
+
+# One lock per download directory, shared by every AttachmentStore on it
+_manifest_locks: Dict[str, threading.Lock] = {}
+_manifest_locks_guard = threading.Lock()
+
+# Size of the chunks read from the HTTP response
+CHUNK_SIZE = 64 * 1024
+
+# Attachment bytes encoded per step: a multiple of 57, so every chunk
+# encodes to whole 76-character base64 lines
+ENCODE_CHUNK_SIZE = CHUNK_SIZE // 57 * 57
+
+
+def walk_parts(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yield every MIME part of a message payload, depth first"""
+    yield payload
+    for part in payload.get('parts', []):
+        yield from walk_parts(part)
+
+
+def find_attachments(message: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """List the attachment parts of a 'full' format message"""
+    attachments = []
+    for part in walk_parts(message.get('payload', {})):
+        body = part.get('body', {})
+        if not part.get('filename') or not (body.get('attachmentId') or body.get('data')):
+            continue
+        attachments.append({
+            'part_id': part.get('partId'),
+            'filename': part['filename'],
+            'mime_type': part.get('mimeType'),
+            'size': body.get('size', 0),
+            'attachment_id': body.get('attachmentId'),
+            'data': body.get('data')
+        })
+    return attachments
+
+
+def without_attachment_data(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a message without the inline data of attachment parts
+
+    Text bodies are kept. The copy is marked '_attachment_data_dropped'; a
+    message without inline attachment data is returned as is.
+    """
+    def droppable(part):
+        return bool(part.get('body', {}).get('data')) and (
+            part.get('filename') or not part.get('mimeType', '').startswith('text/'))
+
+    if not any(droppable(part) for part in walk_parts(message.get('payload', {}))):
+        return message
+    stripped = copy.deepcopy(message)
+    for part in walk_parts(stripped.get('payload', {})):
+        if droppable(part):
+            del part['body']['data']
+    stripped['_attachment_data_dropped'] = True
+    return stripped
+
+
+def safe_filename(filename: str) -> str:
+    """Strip path components and unsafe characters from an attachment filename"""
+    name = os.path.basename(filename.replace('\\', '/')).strip()
+    name = re.sub(r'[^\w.\- ]', '_', name)
+    return name.lstrip('.') or 'attachment'
+
+
+def decode_data_field(chunks: Iterable[bytes], write: Callable[[bytes], Any]) -> int:
+    """Incrementally decode the base64url "data" field of a JSON response body
+
+    Only a few bytes of undecoded input are held between chunks. Returns the
+    number of decoded bytes passed to write.
+    """
+    marker = b'"data"'
+    header = b''
+    pending = b''
+    in_data = False
+    total = 0
+
+    for chunk in chunks:
+        if not in_data:
+            header += chunk
+            index = header.find(marker)
+            if index < 0:
+                header = header[-len(marker):]
+                continue
+            rest = header[index + len(marker):]
+            quote = rest.find(b'"')
+            if quote < 0:
+                header = header[index:]
+                continue
+            chunk = rest[quote + 1:]
+            header = b''
+            in_data = True
+
+        end = chunk.find(b'"')
+        if end >= 0:
+            chunk = chunk[:end]
+        pending += chunk
+        usable = len(pending) - len(pending) % 4
+        if usable:
+            decoded = base64.urlsafe_b64decode(pending[:usable])
+            write(decoded)
+            total += len(decoded)
+            pending = pending[usable:]
+        if end >= 0:
+            break
+
+    if pending:
+        decoded = base64.urlsafe_b64decode(pending + b'=' * (-len(pending) % 4))
+        write(decoded)
+        total += len(decoded)
+    return total
+
+
+def _header_bytes(message: Message) -> bytes:
+    """The folded header block of message, with the blank line that ends it"""
+    fold = message.policy.fold_binary
+    return b''.join(fold(name, value) for name, value in message.items()) + b'\n'
+
+
+def write_mime_message(out: BinaryIO, to: str, subject: str, body: str,
+                       body_type: str, paths: List[str]) -> int:
+    """Write a multipart/mixed message with the given files attached to out
+
+    Attachments are read and base64-encoded one chunk at a time. Returns the
+    number of bytes written.
+    """
+    for path in paths:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"Attachment not found: {path}")
+
+    boundary = f"==============={secrets.token_hex(16)}=="
+    headers = Message()
+    headers['to'] = to
+    headers['subject'] = subject
+    headers['MIME-Version'] = '1.0'
+    headers['Content-Type'] = f'multipart/mixed; boundary="{boundary}"'
+    delimiter = f"\n--{boundary}\n".encode('ascii')
+
+    written = out.write(_header_bytes(headers))
+    written += out.write(delimiter)
+    written += out.write(MIMEText(body, 'html' if body_type == 'html' else 'plain').as_bytes())
+
+    for path in paths:
+        mime_type, encoding = mimetypes.guess_type(path)
+        if mime_type is None or encoding is not None:
+            mime_type = 'application/octet-stream'
+        part = MIMEBase(*mime_type.split('/', 1))
+        part['Content-Transfer-Encoding'] = 'base64'
+        filename = os.path.basename(path)
+        if not filename.isascii():
+            filename = ('utf-8', '', filename)
+        part.add_header('Content-Disposition', 'attachment', filename=filename)
+
+        written += out.write(delimiter)
+        written += out.write(_header_bytes(part))
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(ENCODE_CHUNK_SIZE), b''):
+                written += out.write(base64.encodebytes(block))
+
+    written += out.write(f"\n--{boundary}--\n".encode('ascii'))
+    return written
+
+
+class AttachmentStore:
+    """Download directory with a manifest of completed attachments
+
+    Entries are keyed by message id and MIME part id, because Gmail hands out
+    a different attachmentId for the same attachment on each message fetch.
+    Stores on the same directory share a lock, and the manifest is re-read
+    before each update, so concurrent downloads keep each other's entries.
+    """
+
+    def __init__(self, directory: str = ATTACHMENTS_DIR):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        with _manifest_locks_guard:
+            self._lock = _manifest_locks.setdefault(os.path.realpath(directory), threading.Lock())
+        with self._lock:
+            self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        with open(self.manifest_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.manifest, file, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @staticmethod
+    def file_sha256(path: str) -> str:
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for block in iter(lambda: file.read(CHUNK_SIZE), b''):
+                hasher.update(block)
+        return hasher.hexdigest()
+
+    def existing(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest entry for key if its file is still intact"""
+        with self._lock:
+            self.manifest = self._load_manifest()
+            entry = self.manifest.get(key)
+        if not entry:
+            return None
+        path = os.path.join(self.directory, entry['filename'])
+        if not os.path.exists(path) or self.file_sha256(path) != entry['sha256']:
+            return None
+        return entry
+
+    def _target_name(self, key: str, message_id: str, filename: str) -> str:
+        name = safe_filename(filename)
+        taken = {entry['filename'] for other, entry in self.manifest.items() if other != key}
+        if name in taken or (os.path.exists(os.path.join(self.directory, name)) and key not in self.manifest):
+            name = f"{message_id}_{name}"
+        return name
+
+    def save(self, message_id: str, attachment: Dict[str, Any],
+             chunks: Optional[Iterable[bytes]] = None) -> Dict[str, Any]:
+        """Write an attachment to disk, verifying its size and recording its hash
+
+        chunks is the raw attachments().get JSON response; inline parts use
+        the data already present in the message. The data goes to a uniquely
+        named temporary file; the target name and manifest entry are settled
+        under the directory lock once it is complete.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        key = f"{message_id}:{attachment['part_id']}"
+        hasher = hashlib.sha256()
+
+        if chunks is None:
+            chunks = [b'{"data": "' + attachment['data'].encode('ascii') + b'"}']
+
+        file = tempfile.NamedTemporaryFile(dir=self.directory, prefix='.download-', suffix='.part',
+                                           delete=False)
+        tmp_path = file.name
+        try:
+            with file:
+                def write(data: bytes):
+                    hasher.update(data)
+                    file.write(data)
+                size = decode_data_field(chunks, write)
+            expected = attachment.get('size')
+            if expected and size != expected:
+                raise ValueError(f"Attachment {attachment['filename']} is {size} bytes, expected {expected}")
+
+            with self._lock:
+                self.manifest = self._load_manifest()
+                name = self._target_name(key, message_id, attachment['filename'])
+                os.replace(tmp_path, os.path.join(self.directory, name))
+                entry = {
+                    'filename': name,
+                    'message_id': message_id,
+                    'part_id': attachment['part_id'],
+                    'mime_type': attachment.get('mime_type'),
+                    'size': size,
+                    'sha256': hasher.hexdigest()
+                }
+                self.manifest[key] = entry
+                self._save_manifest()
+            return entry
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Size-bounded LRU caches
+Keeps API resources up to a number of entries and an approximate byte
+budget, so a few large Gmail payloads can't grow a client's memory without
+bound. Callers serialize access with their own lock.
+"""
+
+import json
+from collections import OrderedDict
+from typing import Any, Hashable, Iterator, Optional
+
+
+def approximate_size(value: Any) -> int:
+    """Rough in-memory footprint of a JSON-like value: its serialized length"""
+    return len(json.dumps(value, default=str, separators=(',', ':')))
+
+
+class LRUCache:
+    """Least recently used cache bounded by entry count and total size"""
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._sizes = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Look up an entry, marking it recently used"""
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Insert an entry, evicting the oldest ones past either bound
+
+        An entry larger than the whole byte budget is not kept.
+        """
+        self.pop(key)
+        size = approximate_size(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        self._entries[key] = value
+        self._sizes[key] = size
+        self.size += size
+        while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.size > self.max_bytes):
+            oldest, _ = self._entries.popitem(last=False)
+            self.size -= self._sizes.pop(oldest)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._entries:
+            return default
+        self.size -= self._sizes.pop(key)
+        return self._entries.pop(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._sizes.clear()
+        self.size = 0
+
+    def keys(self) -> Iterator[Hashable]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
@@ -8,14 +8,18 @@ import csv
 import json
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 
+from models import EventRecord, TodoRecord, date_ordinal, title_key, title_keys_match
+from profiling import profiled
+from shards import fetch_sharded, list_all_events
+from transport import HttpPool
+
 # Google Calendar API scopes
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly',
           'https://www.googleapis.com/auth/calendar.events']
@@ -24,6 +28,36 @@ TOKEN_FILE = 'token.json'
 CREDENTIALS_FILE = 'credentials.json'
 TODO_FILE = 'ToDoList.csv'
 
+TODO_FIELDS = ['Section', 'Task', 'Start Date', 'End Date', 'Urgency']
+
+def titles_match(title1: str, title2: str) -> bool:
+    """Check if two titles are similar enough to be considered a match"""
+    # Simple similarity check - could be enhanced with fuzzy matching
+    return title_keys_match(title_key(title1), title_key(title2))
+
+def dates_match(date1: str, date2: str) -> bool:
+    """Check if two date strings represent the same date"""
+    d1 = date_ordinal(date1)
+    return d1 is not None and d1 == date_ordinal(date2)
+
+def read_todos(todo_file: str = TODO_FILE) -> List[Dict[str, str]]:
+    """Read all rows of the todo CSV"""
+    if not os.path.exists(todo_file):
+        return []
+    with open(todo_file, 'r', newline='', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+def append_todos(rows: List[Dict[str, str]], todo_file: str = TODO_FILE):
+    """Append several todo rows in one write (header added for a new file)"""
+    if not rows:
+        return
+    new_file = not os.path.exists(todo_file) or os.path.getsize(todo_file) == 0
+    with open(todo_file, 'a', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=TODO_FIELDS)
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+
 class CalendarTodoSync:
     def __init__(self):
         self.service = None
@@ -52,35 +86,31 @@ class CalendarTodoSync:
             with open(TOKEN_FILE, 'w') as token:
                 token.write(creds.to_json())
         
-        self.service = build('calendar', 'v3', credentials=creds)
+        self.service = HttpPool(creds).build('calendar', 'v3')
         
-    def read_todo_list(self) -> List[Dict[str, str]]:
+    def read_todo_list(self) -> List[TodoRecord]:
         """Read todos from CSV file"""
-        todos = []
-        if os.path.exists(TODO_FILE):
-            with open(TODO_FILE, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    todos.append(row)
+        todos = [TodoRecord.from_row(row) for row in read_todos()]
         self.todos = todos
         return todos
         
-    def get_calendar_events(self, days_ahead: int = 30) -> List[Dict[str, Any]]:
+    def _list_events(self, time_min: str, time_max: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Every page of primary calendar events in a window"""
+        return list_all_events(self.service, calendarId='primary', timeMin=time_min, timeMax=time_max,
+                               singleEvents=True, orderBy='startTime')
+    
+    def get_calendar_events(self, days_ahead: int = 30) -> List[EventRecord]:
         """Get calendar events from the next N days"""
         try:
-            # Get primary calendar events
-            now = datetime.now().isoformat() + 'Z'
-            end_time = (datetime.now() + timedelta(days=days_ahead)).isoformat() + 'Z'
+            # Get primary calendar events; long ranges are fetched in concurrent shards
+            now = datetime.now()
+            time_min = now.isoformat() + 'Z'
+            time_max = (now + timedelta(days=days_ahead)).isoformat() + 'Z'
             
-            events_result = self.service.events().list(
-                calendarId='primary',
-                timeMin=now,
-                timeMax=end_time,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+            items, _ = fetch_sharded(self._list_events, time_min, time_max)
             
-            events = events_result.get('items', [])
+            # Keep only the compact record of each event
+            events = [EventRecord.from_api(event) for event in items]
             self.calendar_events = events
             return events
             
@@ -92,63 +122,50 @@ class CalendarTodoSync:
         """Find calendar events that should be added as todos"""
         missing_todos = []
         
+        # Index todos by start date so each event only checks same-day todos
+        todos_by_date: Dict[int, List[TodoRecord]] = {}
+        for todo in self.todos:
+            if todo.start_ordinal is not None:
+                todos_by_date.setdefault(todo.start_ordinal, []).append(todo)
+        
         for event in self.calendar_events:
-            event_title = event.get('summary', 'Untitled Event')
-            event_start = event.get('start', {})
-            
-            # Extract date from calendar event
-            if 'dateTime' in event_start:
-                event_date = datetime.fromisoformat(event_start['dateTime'].replace('Z', '+00:00')).date()
-            elif 'date' in event_start:
-                event_date = datetime.fromisoformat(event_start['date']).date()
-            else:
+            if event.start_ordinal is None:
                 continue
                 
             # Check if this event already exists as a todo
-            found_match = False
-            for todo in self.todos:
-                if (self._titles_match(todo['Task'], event_title) and 
-                    self._dates_match(todo.get('Start Date', ''), str(event_date))):
-                    found_match = True
-                    break
+            found_match = any(
+                title_keys_match(todo.title_key, event.title_key)
+                for todo in todos_by_date.get(event.start_ordinal, [])
+            )
                     
             if not found_match:
                 missing_todos.append({
-                    'title': event_title,
-                    'date': str(event_date),
+                    'title': event.summary,
+                    'date': event.start_date,
                     'original_event': event
                 })
                 
         return missing_todos
         
-    def find_missing_calendar_events_from_todos(self) -> List[Dict[str, str]]:
+    def find_missing_calendar_events_from_todos(self) -> List[TodoRecord]:
         """Find todos with end dates that should be added to calendar"""
         missing_events = []
         
+        # Index events by start date so each todo only checks same-day events
+        events_by_date: Dict[int, List[EventRecord]] = {}
+        for event in self.calendar_events:
+            if event.start_ordinal is not None:
+                events_by_date.setdefault(event.start_ordinal, []).append(event)
+        
         for todo in self.todos:
-            if not todo.get('End Date') or todo['End Date'].strip() == '':
+            if not todo.end_date:
                 continue
                 
-            todo_title = todo['Task']
-            todo_end_date = todo['End Date']
-            
             # Check if this todo already exists as a calendar event
-            found_match = False
-            for event in self.calendar_events:
-                event_title = event.get('summary', 'Untitled Event')
-                event_start = event.get('start', {})
-                
-                if 'dateTime' in event_start:
-                    event_date = datetime.fromisoformat(event_start['dateTime'].replace('Z', '+00:00')).date()
-                elif 'date' in event_start:
-                    event_date = datetime.fromisoformat(event_start['date']).date()
-                else:
-                    continue
-                    
-                if (self._titles_match(todo_title, event_title) and 
-                    self._dates_match(todo_end_date, str(event_date))):
-                    found_match = True
-                    break
+            found_match = any(
+                title_keys_match(todo.title_key, event.title_key)
+                for event in events_by_date.get(todo.end_ordinal, [])
+            )
                     
             if not found_match:
                 missing_events.append(todo)
@@ -157,37 +174,17 @@ class CalendarTodoSync:
         
     def _titles_match(self, title1: str, title2: str) -> bool:
         """Check if two titles are similar enough to be considered a match"""
-        # Simple similarity check - could be enhanced with fuzzy matching
-        t1 = title1.lower().strip()
-        t2 = title2.lower().strip()
-        
-        # Exact match
-        if t1 == t2:
-            return True
-            
-        # Check if one contains the other (for partial matches)
-        if len(t1) > 5 and len(t2) > 5:
-            if t1 in t2 or t2 in t1:
-                return True
-                
-        return False
+        return titles_match(title1, title2)
         
     def _dates_match(self, date1: str, date2: str) -> bool:
         """Check if two date strings represent the same date"""
-        try:
-            if not date1 or not date2:
-                return False
-            d1 = datetime.strptime(date1.strip(), '%Y-%m-%d').date()
-            d2 = datetime.strptime(date2.strip(), '%Y-%m-%d').date()
-            return d1 == d2
-        except ValueError:
-            return False
+        return dates_match(date1, date2)
             
-    def create_calendar_event(self, todo: Dict[str, str]) -> bool:
+    def create_calendar_event(self, todo: TodoRecord) -> bool:
         """Create a calendar event from a todo item"""
         try:
-            event_date = todo['End Date']
-            event_title = f"📋 {todo['Task']}"  # Prefix to indicate it's from todo list
+            event_date = todo.end_date
+            event_title = f"📋 {todo.task}"  # Prefix to indicate it's from todo list
             
             # Create all-day event
             event = {
@@ -198,7 +195,7 @@ class CalendarTodoSync:
                 'end': {
                     'date': event_date,
                 },
-                'description': f"Auto-created from todo list\nSection: {todo.get('Section', 'N/A')}\nUrgency: {todo.get('Urgency', 'N/A')}"
+                'description': f"Auto-created from todo list\nSection: {todo.section or 'N/A'}\nUrgency: {todo.urgency or 'N/A'}"
             }
             
             result = self.service.events().insert(calendarId='primary', body=event).execute()
@@ -233,8 +230,7 @@ class CalendarTodoSync:
             
             # Write back to file
             with open(TODO_FILE, 'w', newline='', encoding='utf-8') as file:
-                fieldnames = ['Section', 'Task', 'Start Date', 'End Date', 'Urgency']
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
+                writer = csv.DictWriter(file, fieldnames=TODO_FIELDS)
                 writer.writeheader()
                 writer.writerows(existing_todos)
                 
@@ -251,25 +247,29 @@ class CalendarTodoSync:
         
         # Step 1: Read current state
         print("1. Reading current todo list...")
-        todos = self.read_todo_list()
+        with profiled("sync:read_todos"):
+            todos = self.read_todo_list()
         print(f"   Found {len(todos)} todos")
         
         print("\n2. Reading calendar events...")
-        events = self.get_calendar_events()
+        with profiled("sync:calendar_events"):
+            events = self.get_calendar_events()
         print(f"   Found {len(events)} calendar events")
         
         # Step 2: Find discrepancies
         print("\n3. Analyzing discrepancies...")
         
-        missing_todos = self.find_missing_todos_from_calendar()
+        with profiled("sync:find_missing"):
+            missing_todos = self.find_missing_todos_from_calendar()
+            missing_events = self.find_missing_calendar_events_from_todos()
+        
         print(f"   📅➡️📋 Calendar events missing from todos: {len(missing_todos)}")
         for todo in missing_todos:
             print(f"      - {todo['title']} on {todo['date']}")
             
-        missing_events = self.find_missing_calendar_events_from_todos()
         print(f"   📋➡️📅 Todos with end dates missing from calendar: {len(missing_events)}")
         for todo in missing_events:
-            print(f"      - {todo['Task']} on {todo['End Date']}")
+            print(f"      - {todo.task} on {todo.end_date}")
             
         # Step 3: Perform sync (test mode - ask for confirmation)
         print("\n4. Sync recommendations:")
@@ -284,10 +284,11 @@ class CalendarTodoSync:
             
         if missing_events:
             print("\n   📋➡️📅 Auto-adding these todos as calendar events:")
-            for todo in missing_events:
-                success = self.create_calendar_event(todo)
-                if not success:
-                    print(f"   ⚠️ Failed to create event for: {todo['Task']}")
+            with profiled("sync:create_events"):
+                for todo in missing_events:
+                    success = self.create_calendar_event(todo)
+                    if not success:
+                        print(f"   ⚠️ Failed to create event for: {todo.task}")
                     
         # Step 4: Summary
         print("\n=== Sync Test Results ===")
@@ -311,7 +312,8 @@ class CalendarTodoSync:
 def main():
     """Run the sync test"""
     try:
-        sync = CalendarTodoSync()
+        with profiled("sync:authenticate"):
+            sync = CalendarTodoSync()
         results = sync.perform_sync_test()
         return results
     except Exception as e:
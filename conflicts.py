@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Calendar conflict detection
+Sort-and-sweep over interval endpoints to find overlapping events in
+O(n log n + k) for n events and k overlapping pairs
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dateutil import tz
+
+from recurrence import parse_event_time
+
+# Endpoint kinds; ends sort before starts so back-to-back events don't conflict
+_END = 0
+_START = 1
+
+
+def event_interval(event: Dict[str, Any], default_tz=None) -> Optional[Tuple[datetime, datetime]]:
+    """(start, end) of an event in UTC, or None if it can't cause a conflict"""
+    if event.get('status') == 'cancelled' or event.get('transparency') == 'transparent':
+        return None
+    for attendee in event.get('attendees', []):
+        if attendee.get('self') and attendee.get('responseStatus') == 'declined':
+            return None
+    if 'start' not in event or 'end' not in event:
+        return None
+    start = parse_event_time(event['start'], default_tz).astimezone(timezone.utc)
+    end = parse_event_time(event['end'], default_tz).astimezone(timezone.utc)
+    if end <= start:
+        return None
+    return start, end
+
+
+def find_overlaps(intervals: Sequence[Tuple[datetime, datetime]]) -> Tuple[List[Tuple[int, int]], List[List[int]]]:
+    """Find overlapping intervals with a single sweep
+
+    Returns index pairs that overlap, and clusters: maximal groups of two or
+    more intervals chained together by overlaps.
+    """
+    points = []
+    for index, (start, end) in enumerate(intervals):
+        points.append((start, _START, index))
+        points.append((end, _END, index))
+    points.sort()
+
+    active = set()
+    pairs = []
+    clusters = []
+    current = []
+    for _, kind, index in points:
+        if kind == _START:
+            pairs.extend((other, index) for other in active)
+            active.add(index)
+            current.append(index)
+        else:
+            active.discard(index)
+            if not active:
+                if len(current) > 1:
+                    clusters.append(current)
+                current = []
+    return pairs, clusters
+
+
+def find_conflicts(events_by_calendar: Dict[str, Tuple[List[Dict[str, Any]], Optional[str]]],
+                   include_all_day: bool = False) -> Dict[str, Any]:
+    """Find double-bookings across calendars
+
+    events_by_calendar maps calendar id to (events, calendar time zone).
+    The same meeting on several calendars (same iCalUID and start) counts once.
+    """
+    entries = []
+    intervals = []
+    seen = set()
+    for calendar_id, (events, calendar_tz) in events_by_calendar.items():
+        default_tz = tz.gettz(calendar_tz) if calendar_tz else timezone.utc
+        for event in events:
+            if not include_all_day and 'date' in event.get('start', {}):
+                continue
+            interval = event_interval(event, default_tz)
+            if interval is None:
+                continue
+            key = (event.get('iCalUID') or event.get('id'), interval[0])
+            if key in seen:
+                continue
+            seen.add(key)
+            entries.append((calendar_id, event))
+            intervals.append(interval)
+
+    pairs, clusters = find_overlaps(intervals)
+    return {
+        'events': entries,
+        'intervals': intervals,
+        'pairs': pairs,
+        'clusters': clusters
+    }
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Email-to-Todo Extraction Pipeline
+Streams matching Gmail messages, pulls bodies only for likely action items,
+extracts task and due date, and batch-appends new todos to ToDoList.csv.
+A checkpoint per query remembers the newest processed message.
+"""
+
+import base64
+import json
+import os
+import re
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from dateutil import parser as date_parser
+from dateutil.relativedelta import relativedelta
+
+from attachments import walk_parts
+from calendar_todo_sync import TODO_FILE, append_todos, read_todos
+from models import TodoRecord, title_keys_match
+
+CHECKPOINT_FILE = 'email_todo_checkpoint.json'
+
+# Default query for messages that may hold action items
+DEFAULT_QUERY = 'is:unread label:action'
+
+# Message ids per list request (the API maximum)
+LIST_PAGE_SIZE = 500
+
+# Subject/snippet words that make a message worth fetching in full
+ACTION_KEYWORDS = ('action', 'todo', 'to-do', 'task', 'please', 'deadline', 'due',
+                   'reminder', 'request', 'follow up', 'follow-up', 'asap', 'by ')
+URGENT_KEYWORDS = ('urgent', 'asap', 'immediately', 'today')
+
+# Reply/forward/tag prefixes stripped from subjects to get the task title
+SUBJECT_PREFIX = re.compile(r'^\s*((re|fw|fwd|aw)\s*:|\[[^\]]*\])\s*', re.IGNORECASE)
+
+# Date expressions, anchored by a due-date cue ("due", "by", "deadline", "before")
+_MONTH = r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?'
+_DATE = (r'(\d{4}-\d{2}-\d{2}'
+         r'|\d{1,2}/\d{1,2}(?:/\d{2,4})?'
+         rf'|{_MONTH}\s+\d{{1,2}}(?:st|nd|rd|th)?(?:,?\s+\d{{4}})?'
+         rf'|\d{{1,2}}(?:st|nd|rd|th)?\s+{_MONTH}(?:\s+\d{{4}})?)')
+DUE_DATE = re.compile(rf'\b(?:due|by|deadline:?|before|until)\s+(?:on\s+)?{_DATE}', re.IGNORECASE)
+ANY_DATE = re.compile(rf'\b{_DATE}', re.IGNORECASE)
+
+
+def message_body_text(message: Dict[str, Any]) -> str:
+    """The first text/plain body of a 'full' format message"""
+    for part in walk_parts(message.get('payload', {})):
+        if part.get('mimeType') == 'text/plain':
+            data = part.get('body', {}).get('data', '')
+            if data:
+                return base64.urlsafe_b64decode(data).decode('utf-8', errors='replace')
+    return ''
+
+
+def message_headers(message: Dict[str, Any]) -> Dict[str, str]:
+    return {h['name']: h['value'] for h in message.get('payload', {}).get('headers', [])}
+
+
+def task_title(subject: str) -> str:
+    """Task title from an email subject, without Re:/Fwd:/[tag] prefixes"""
+    title = subject
+    while True:
+        stripped = SUBJECT_PREFIX.sub('', title, count=1)
+        if stripped == title:
+            return title.strip()
+        title = stripped
+
+
+def extract_due_date(text: str, reference: datetime) -> Optional[str]:
+    """First due date mentioned in text as YYYY-MM-DD, preferring cued dates
+
+    Dates without a cue ("our Oct 3 meeting") only count if they are not in
+    the past.
+    """
+    for pattern in (DUE_DATE, ANY_DATE):
+        for match in pattern.finditer(text):
+            try:
+                due = date_parser.parse(match.group(1), default=reference, fuzzy=True)
+            except (ValueError, OverflowError):
+                continue
+            if due.date() < reference.date():
+                if pattern is ANY_DATE:
+                    continue
+                # "due March 3" without a year means the next March 3
+                if not re.search(r'\d{4}', match.group(1)):
+                    due += relativedelta(years=1)
+            return due.date().isoformat()
+    return None
+
+
+def is_candidate(subject: str, snippet: str) -> bool:
+    """Cheap metadata check for messages that may contain an action item"""
+    text = f"{subject} {snippet}".lower()
+    return any(keyword in text for keyword in ACTION_KEYWORDS)
+
+
+class EmailTodoPipeline:
+    """Turns matching Gmail messages into ToDoList.csv rows, once per message"""
+
+    def __init__(self, client, todo_file: str = TODO_FILE, checkpoint_file: str = CHECKPOINT_FILE):
+        self.client = client
+        self.todo_file = todo_file
+        self.checkpoint_file = checkpoint_file
+
+    def _load_checkpoints(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.checkpoint_file):
+            return {}
+        with open(self.checkpoint_file, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def _save_checkpoint(self, key: str, checkpoint: Dict[str, Any]):
+        checkpoints = self._load_checkpoints()
+        checkpoints[key] = checkpoint
+        tmp_path = self.checkpoint_file + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(checkpoints, file, indent=2)
+        os.replace(tmp_path, self.checkpoint_file)
+
+    def list_new_ids(self, query: str, checkpoint: Dict[str, Any]) -> List[str]:
+        """Ids of every matching message after the checkpoint, newest first (ids only)"""
+        last_date = int(checkpoint.get('internal_date', 0))
+        if last_date:
+            # after: takes epoch seconds; internalDate is milliseconds
+            query = f"{query} after:{last_date // 1000}"
+
+        ids = []
+        page_token = None
+        gmail = self.client.gmail_service
+        while True:
+            result = gmail.users().messages().list(
+                userId='me', q=query, maxResults=LIST_PAGE_SIZE, pageToken=page_token
+            ).execute()
+            ids.extend(msg['id'] for msg in result.get('messages', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return ids
+
+    def stream_new_messages(self, query: str, checkpoint: Dict[str, Any],
+                            max_messages: int) -> Iterator[Dict[str, Any]]:
+        """Yield metadata for up to max_messages messages after the checkpoint, oldest first
+
+        Gmail lists newest first, so all new ids are listed and walked in
+        reverse. The checkpoint then only moves up to messages that were
+        processed, and anything past max_messages is left for the next run.
+        """
+        last_date = int(checkpoint.get('internal_date', 0))
+        processed = set(checkpoint.get('message_ids', []))
+
+        yielded = 0
+        for message_id in reversed(self.list_new_ids(query, checkpoint)):
+            if yielded >= max_messages:
+                return
+            if message_id in processed:
+                continue
+            metadata = self.client.message_detail(message_id, 'metadata')
+            # after: has one-second resolution; older messages in that second were handled
+            if int(metadata.get('internalDate', 0)) < last_date:
+                continue
+            yield metadata
+            yielded += 1
+
+    def extract(self, message: Dict[str, Any]) -> Dict[str, str]:
+        """Todo row for a 'full' format message"""
+        headers = message_headers(message)
+        subject = headers.get('Subject', '')
+        try:
+            received = parsedate_to_datetime(headers['Date'])
+        except (KeyError, TypeError, ValueError):
+            received = datetime.fromtimestamp(int(message.get('internalDate', 0)) / 1000)
+        received = received.replace(tzinfo=None)
+
+        body = message_body_text(message)
+        due = extract_due_date(f"{subject}\n{body}", received)
+        text = f"{subject} {body}".lower()
+        return {
+            'Section': 'work',
+            'Task': task_title(subject) or 'Email follow-up',
+            'Start Date': received.date().isoformat(),
+            'End Date': due or '',
+            'Urgency': 'urgent' if any(word in text for word in URGENT_KEYWORDS) else 'not urgent'
+        }
+
+    @staticmethod
+    def _is_duplicate(row: TodoRecord, todos: List[TodoRecord]) -> bool:
+        for todo in todos:
+            if not title_keys_match(todo.title_key, row.title_key):
+                continue
+            if row.end_ordinal is None or todo.end_ordinal is None or todo.end_ordinal == row.end_ordinal:
+                return True
+        return False
+
+    def run(self, query: str = DEFAULT_QUERY, max_messages: int = 200,
+            require_keywords: bool = True, dry_run: bool = False) -> Dict[str, Any]:
+        """Process new matching mail and append the extracted todos
+
+        Bodies are only fetched for candidates that pass the metadata check.
+        A message whose todo can't be extracted is reported under 'failed'
+        and doesn't hold back the checkpoint. With dry_run nothing is written
+        and the checkpoint is not moved.
+        """
+        key = f"{getattr(self.client, 'token_file', '')}|{query}"
+        checkpoint = self._load_checkpoints().get(key, {})
+        todos = [TodoRecord.from_row(row) for row in read_todos(self.todo_file)]
+
+        scanned = 0
+        candidates = 0
+        skipped_duplicates = 0
+        failed = []
+        new_rows = []
+        newest_date = int(checkpoint.get('internal_date', 0))
+        newest_ids = set(checkpoint.get('message_ids', []))
+
+        for metadata in self.stream_new_messages(query, checkpoint, max_messages):
+            scanned += 1
+            internal_date = int(metadata.get('internalDate', 0))
+            if internal_date > newest_date:
+                newest_date = internal_date
+                newest_ids = set()
+            if internal_date == newest_date:
+                newest_ids.add(metadata['id'])
+
+            subject = message_headers(metadata).get('Subject', '')
+            if require_keywords and not is_candidate(subject, metadata.get('snippet', '')):
+                continue
+            candidates += 1
+
+            message = self.client.message_detail(metadata['id'], 'full')
+            try:
+                row = TodoRecord.from_row(self.extract(message))
+            except Exception:
+                failed.append(metadata['id'])
+                continue
+            if self._is_duplicate(row, todos) or self._is_duplicate(row, new_rows):
+                skipped_duplicates += 1
+                continue
+            new_rows.append(row)
+
+        if not dry_run:
+            append_todos([row.to_row() for row in new_rows], self.todo_file)
+            if scanned:
+                # Ids sharing the newest timestamp are kept so after: doesn't re-add them
+                self._save_checkpoint(key, {
+                    'internal_date': newest_date,
+                    'message_ids': sorted(newest_ids),
+                    'updated': datetime.now().isoformat()
+                })
+
+        return {
+            'scanned': scanned,
+            'candidates': candidates,
+            'duplicates': skipped_duplicates,
+            'failed': failed,
+            'added': [row.to_row() for row in new_rows]
+        }
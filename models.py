@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Compact event and todo records shared by the MCP server and the sync script
+Dates are parsed once into proleptic ordinals (date.toordinal()), so the
+matching loops compare ints, and only the fields the code reads are kept.
+"""
+
+from datetime import date
+from typing import Any, Dict, Optional
+
+
+def date_ordinal(value: Optional[str]) -> Optional[int]:
+    """Ordinal of a 'YYYY-MM-DD...' string (time part ignored), or None"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value.strip()[:10]).toordinal()
+    except ValueError:
+        return None
+
+
+def title_key(title: str) -> str:
+    """Normalized title used for matching"""
+    return title.lower().strip()
+
+
+def title_keys_match(key1: str, key2: str) -> bool:
+    """Check if two normalized titles are similar enough to be considered a match"""
+    # Exact match
+    if key1 == key2:
+        return True
+
+    # Check if one contains the other (for partial matches)
+    if len(key1) > 5 and len(key2) > 5:
+        if key1 in key2 or key2 in key1:
+            return True
+
+    return False
+
+
+class EventRecord:
+    """The parts of a Calendar event resource that the tools and sync use"""
+
+    __slots__ = ('id', 'summary', 'title_key', 'start', 'end', 'all_day',
+                 'start_ordinal', 'description', 'location', 'etag')
+
+    def __init__(self, id: Optional[str], summary: str, start: Optional[str], end: Optional[str],
+                 all_day: bool = False, description: Optional[str] = None,
+                 location: Optional[str] = None, etag: Optional[str] = None):
+        self.id = id
+        self.summary = summary
+        self.title_key = title_key(summary)
+        self.start = start
+        self.end = end
+        self.all_day = all_day
+        # Date as written in the event's own offset, like fromisoformat(...).date()
+        self.start_ordinal = date_ordinal(start)
+        self.description = description
+        self.location = location
+        self.etag = etag
+
+    @classmethod
+    def from_api(cls, event: Dict[str, Any], default_title: str = 'Untitled Event') -> 'EventRecord':
+        start = event.get('start', {})
+        end = event.get('end', {})
+        return cls(
+            event.get('id'),
+            event.get('summary', default_title),
+            start.get('dateTime', start.get('date')),
+            end.get('dateTime', end.get('date')),
+            all_day='date' in start,
+            description=event.get('description'),
+            location=event.get('location'),
+            etag=event.get('etag')
+        )
+
+    @property
+    def start_date(self) -> Optional[str]:
+        """Start date as YYYY-MM-DD"""
+        if self.start_ordinal is None:
+            return None
+        return date.fromordinal(self.start_ordinal).isoformat()
+
+
+class TodoRecord:
+    """One ToDoList.csv row"""
+
+    __slots__ = ('section', 'task', 'title_key', 'start_date', 'end_date',
+                 'start_ordinal', 'end_ordinal', 'urgency')
+
+    def __init__(self, section: str, task: str, start_date: str = '', end_date: str = '',
+                 urgency: str = ''):
+        self.section = section
+        self.task = task
+        self.title_key = title_key(task)
+        self.start_date = start_date
+        self.end_date = end_date
+        self.start_ordinal = date_ordinal(start_date)
+        self.end_ordinal = date_ordinal(end_date)
+        self.urgency = urgency
+
+    @classmethod
+    def from_row(cls, row: Dict[str, str]) -> 'TodoRecord':
+        return cls(
+            row.get('Section') or '',
+            row.get('Task') or '',
+            (row.get('Start Date') or '').strip(),
+            (row.get('End Date') or '').strip(),
+            row.get('Urgency') or ''
+        )
+
+    def to_row(self) -> Dict[str, str]:
+        return {
+            'Section': self.section,
+            'Task': self.task,
+            'Start Date': self.start_date,
+            'End Date': self.end_date,
+            'Urgency': self.urgency
+        }
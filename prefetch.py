@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Background cache warmer for the MCP server
+After the MCP handshake it prefetches the calendar list, upcoming events and
+unread inbox metadata into the client's caches, then refreshes them while the
+server is idle, within a per-hour API request budget. It runs on its own
+daemon thread, so stopping it never waits on (or blocks) a tool call.
+
+MCP_PREFETCH            set to 0 to disable (default 1)
+MCP_PREFETCH_INTERVAL   seconds between refreshes (default 240)
+MCP_PREFETCH_BUDGET     API requests the warmer may use per hour (default 600)
+"""
+
+import os
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+ENABLED = os.environ.get('MCP_PREFETCH', '1') != '0'
+REFRESH_INTERVAL = float(os.environ.get('MCP_PREFETCH_INTERVAL', '240'))
+REQUEST_BUDGET = int(os.environ.get('MCP_PREFETCH_BUDGET', '600'))
+
+# A refresh only runs when no tool call has started for this many seconds
+IDLE_SECONDS = 10
+
+# What gets warmed: these match the tools' default arguments
+AGENDA_RESULTS = 10
+INBOX_QUERY = 'is:unread'
+INBOX_RESULTS = 20
+
+
+class Prefetcher:
+    """Keeps hot listing responses warm for one GoogleServicesClient"""
+
+    def __init__(self, get_client: Callable, interval: float = REFRESH_INTERVAL,
+                 budget: int = REQUEST_BUDGET):
+        self.get_client = get_client
+        self.interval = interval
+        self.budget = budget
+        self._tokens = float(budget)
+        self._refilled = time.monotonic()
+        self._last_activity = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start warming (idempotent)"""
+        with self._lock:
+            if self._thread is not None or not ENABLED:
+                return
+            self._thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Ask the warmer to stop; returns immediately"""
+        self._stop.set()
+
+    def touch(self):
+        """Record foreground activity so refreshes wait for idle time"""
+        self._last_activity = time.monotonic()
+
+    def _spend(self, requests: int) -> bool:
+        """Take requests from the hourly token bucket if enough are left"""
+        now = time.monotonic()
+        self._tokens = min(self.budget, self._tokens + (now - self._refilled) * self.budget / 3600)
+        self._refilled = now
+        if self._tokens < requests:
+            return False
+        self._tokens -= requests
+        return True
+
+    def _run(self):
+        first = True
+        while not self._stop.is_set():
+            idle = time.monotonic() - self._last_activity >= IDLE_SECONDS
+            if first or idle:
+                try:
+                    self.warm()
+                except Exception as error:
+                    print(f"Prefetch failed: {error}", file=sys.stderr)
+                first = False
+                self._stop.wait(self.interval)
+            else:
+                self._stop.wait(IDLE_SECONDS)
+
+    def warm(self):
+        """Fetch the hot listings into the client's caches"""
+        client = self.get_client()
+        with client.refreshing():
+            self._warm_steps(client)
+
+    def _warm_steps(self, client):
+        steps = (
+            (1, client.list_calendars),
+            (1, lambda: client.list_events(max_results=AGENDA_RESULTS)),
+            (1 + INBOX_RESULTS, lambda: client.search_messages(INBOX_QUERY, INBOX_RESULTS)),
+        )
+        for cost, step in steps:
+            if self._stop.is_set() or not self._spend(cost):
+                return
+            step()
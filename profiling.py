@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Opt-in per-call profiling for tool handlers and sync stages
+Set MCP_PROFILE to a comma-separated list of names or patterns (e.g.
+"tool:list_events,sync:*" or "*") to profile matching calls with cProfile
+and tracemalloc. When MCP_PROFILE is unset, profiled() returns a shared no-op
+context manager and nothing else runs.
+
+MCP_PROFILE_RATE   fraction of matching calls to sample (default 1.0)
+MCP_PROFILE_DIR    output directory (default 'profiles')
+MCP_PROFILE_TOP    functions listed in the rolling summary (default 25)
+"""
+
+import atexit
+import contextlib
+import cProfile
+import fnmatch
+import io
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import ContextManager, Deque, Dict, List
+
+# Profiles per name kept on disk and aggregated into the summary
+PROFILE_KEEP = 50
+
+# summary.txt is rebuilt at most this often, on a background thread
+SUMMARY_INTERVAL = 30
+
+_PATTERNS: List[str] = [p.strip() for p in os.environ.get('MCP_PROFILE', '').split(',') if p.strip()]
+ENABLED = bool(_PATTERNS)
+SAMPLE_RATE = float(os.environ.get('MCP_PROFILE_RATE', '1.0'))
+PROFILE_DIR = os.environ.get('MCP_PROFILE_DIR', 'profiles')
+TOP_N = int(os.environ.get('MCP_PROFILE_TOP', '25'))
+
+_NOOP = contextlib.nullcontext()
+_lock = threading.Lock()
+_recent: Dict[str, Deque[str]] = {}
+_timings: Dict[str, Deque[tuple]] = {}
+_sequence = 0
+
+# tracemalloc runs only while at least one profiled call is active
+_active_calls = 0
+_owns_tracing = False
+
+_summary_lock = threading.Lock()
+_summary_written = 0.0
+_summary_dirty = False
+
+
+def profiled(name: str) -> ContextManager:
+    """Profile the enclosed block if name is selected and sampled"""
+    if not ENABLED:
+        return _NOOP
+    if not any(fnmatch.fnmatchcase(name, pattern) for pattern in _PATTERNS):
+        return _NOOP
+    if SAMPLE_RATE < 1.0 and random.random() >= SAMPLE_RATE:
+        return _NOOP
+    return _profile(name)
+
+
+def _start_tracing():
+    global _active_calls, _owns_tracing
+    with _lock:
+        if _active_calls == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _owns_tracing = True
+        _active_calls += 1
+        # tracemalloc is process-wide, so peaks include concurrent calls
+        tracemalloc.reset_peak()
+
+
+def _stop_tracing():
+    """Stop tracemalloc after the last active profiled call (unless someone else started it)"""
+    global _active_calls, _owns_tracing
+    with _lock:
+        _active_calls -= 1
+        if _active_calls == 0 and _owns_tracing:
+            tracemalloc.stop()
+            _owns_tracing = False
+
+
+@contextlib.contextmanager
+def _profile(name: str):
+    _start_tracing()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+ allows one active profiler; skip this call if another is running
+        _stop_tracing()
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        _stop_tracing()
+        _record(name, profiler, elapsed, peak)
+
+
+def _record(name: str, profiler: cProfile.Profile, elapsed: float, peak: int):
+    """Write the call's profile and schedule a summary refresh"""
+    global _sequence, _summary_dirty
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe_name = name.replace(':', '_').replace('/', '_')
+    with _lock:
+        _sequence += 1
+        path = os.path.join(PROFILE_DIR, f"{safe_name}-{int(time.time())}-{_sequence}.prof")
+        profiler.dump_stats(path)
+
+        recent = _recent.setdefault(name, deque())
+        recent.append(path)
+        while len(recent) > PROFILE_KEEP:
+            old_path = recent.popleft()
+            if os.path.exists(old_path):
+                os.remove(old_path)
+        _timings.setdefault(name, deque(maxlen=PROFILE_KEEP)).append((elapsed, peak))
+        _summary_dirty = True
+        due = time.monotonic() - _summary_written >= SUMMARY_INTERVAL
+
+    if due and not _summary_lock.locked():
+        threading.Thread(target=_write_summary, name='profile-summary', daemon=True).start()
+
+
+@atexit.register
+def _write_final_summary():
+    if _summary_dirty:
+        _write_summary()
+
+
+def _write_summary():
+    """Rewrite summary.txt: per-name timings plus top functions by cumulative time"""
+    global _summary_written, _summary_dirty
+    if not _summary_lock.acquire(blocking=False):
+        return
+    try:
+        with _lock:
+            _summary_written = time.monotonic()
+            _summary_dirty = False
+            timings_by_name = {name: list(timings) for name, timings in _timings.items()}
+            paths_by_name = {name: list(paths) for name, paths in _recent.items()}
+        _write_summary_file(timings_by_name, paths_by_name)
+    finally:
+        _summary_lock.release()
+
+
+def _write_summary_file(timings_by_name: Dict[str, List[tuple]], paths_by_name: Dict[str, List[str]]):
+    lines = [f"Profiling summary (last {PROFILE_KEEP} calls per name)", ""]
+    for name in sorted(timings_by_name):
+        timings = timings_by_name[name]
+        durations = [elapsed for elapsed, _ in timings]
+        peaks = [peak for _, peak in timings]
+        lines.append(f"{name}: {len(timings)} calls, mean {sum(durations) / len(durations) * 1000:.1f} ms, "
+                     f"max {max(durations) * 1000:.1f} ms, peak memory {max(peaks) / 1024:.0f} KiB")
+    lines.append("")
+
+    for name in sorted(paths_by_name):
+        output = io.StringIO()
+        stats = None
+        for path in paths_by_name[name]:
+            # Files may be rotated away while the summary is built
+            try:
+                if stats is None:
+                    stats = pstats.Stats(path, stream=output)
+                else:
+                    stats.add(path)
+            except OSError:
+                continue
+        if stats is None:
+            continue
+        stats.sort_stats('cumulative').print_stats(TOP_N)
+        lines.append(f"=== {name} ===")
+        lines.append(output.getvalue())
+
+    with open(os.path.join(PROFILE_DIR, 'summary.txt'), 'w', encoding='utf-8') as file:
+        file.write('\n'.join(lines))
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Local recurrence expansion for Google Calendar events
+Expands recurring masters (RRULE/RDATE/EXDATE) plus their exceptions into
+single instances for a time window, instead of asking the API to do it
+"""
+
+import heapq
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice, takewhile
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from dateutil import parser as date_parser
+from dateutil import tz
+from dateutil.rrule import rrulestr
+
+# Number of (master, window) expansions kept in memory
+EXPANSION_CACHE_SIZE = 256
+
+# UNTIL=YYYYMMDD[THHMMSS[Z]] inside an RRULE/EXRULE
+_UNTIL = re.compile(r'(?<=[:;])UNTIL=(\d{8})(T\d{6})?(Z?)', re.IGNORECASE)
+
+
+def parse_event_time(value: Dict[str, str], default_tz=None) -> datetime:
+    """Parse an event start/end object into an aware datetime
+
+    All-day values ({'date': ...}) are taken as midnight in default_tz.
+    """
+    if 'dateTime' in value:
+        parsed = date_parser.isoparse(value['dateTime'])
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=tz.gettz(value.get('timeZone')) or default_tz or timezone.utc)
+        return parsed
+    parsed = datetime.combine(date.fromisoformat(value['date']), datetime.min.time())
+    return parsed.replace(tzinfo=default_tz or timezone.utc)
+
+
+def _normalize_until(rule: str, all_day: bool, event_tz) -> str:
+    """Rewrite an RRULE's UNTIL into the form dateutil accepts for its DTSTART
+
+    The Calendar API also takes a date-only or floating UNTIL on timed
+    events; those mean the end of that day (or that time) in the event's
+    zone and become UTC. All-day rules keep only the date.
+    """
+    def rewrite(match):
+        day, clock, utc = match.groups()
+        if all_day:
+            return f"UNTIL={day}"
+        if clock and utc:
+            return match.group(0)
+        if clock:
+            until = datetime.strptime(day + clock.upper(), '%Y%m%dT%H%M%S')
+        else:
+            until = datetime.strptime(day, '%Y%m%d') + timedelta(days=1, seconds=-1)
+        return "UNTIL=" + until.replace(tzinfo=event_tz).astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+    return _UNTIL.sub(rewrite, rule)
+
+
+def _instance_suffix(start: datetime, all_day: bool) -> str:
+    """Instance id suffix in the format the Calendar API uses"""
+    if all_day:
+        return start.strftime('%Y%m%d')
+    return start.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+class RecurrenceExpander:
+    """Expands recurring events locally and caches the expanded instances"""
+
+    def __init__(self, cache_size: int = EXPANSION_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[Tuple, Tuple[datetime, ...]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def expand(self, items: Iterable[Dict[str, Any]], time_min: str,
+               time_max: Optional[str] = None, calendar_tz: Optional[str] = None,
+               max_results: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Turn an events().list(singleEvents=False) result into single instances
+
+        Instances are produced lazily in start-time order and only the first
+        max_results are materialized.
+        """
+        default_tz = tz.gettz(calendar_tz) if calendar_tz else timezone.utc
+        window_start = date_parser.isoparse(time_min)
+        window_end = date_parser.isoparse(time_max) if time_max else None
+        if window_start.tzinfo is None:
+            window_start = window_start.replace(tzinfo=timezone.utc)
+        if window_end is not None and window_end.tzinfo is None:
+            window_end = window_end.replace(tzinfo=timezone.utc)
+
+        if window_end is None and max_results is None:
+            raise ValueError("An open-ended window needs max_results")
+
+        masters = []
+        singles = []
+        overridden = set()
+        for item in items:
+            if item.get('recurrence'):
+                masters.append(item)
+                continue
+            if item.get('recurringEventId'):
+                # Modified or cancelled instance; it replaces the generated occurrence
+                original = item.get('originalStartTime', {})
+                overridden.add((item['recurringEventId'],
+                                _instance_suffix(parse_event_time(original, default_tz), 'date' in original)))
+            if item.get('status') != 'cancelled':
+                singles.append(item)
+
+        keyed = [(parse_event_time(event['start'], default_tz), event) for event in singles]
+        keyed.sort(key=lambda entry: entry[0])
+        streams = [iter(keyed)]
+        for master in masters:
+            streams.append(self._master_instances(
+                master, overridden, window_start, window_end, default_tz))
+
+        merged = (event for _, event in heapq.merge(*streams, key=lambda entry: entry[0]))
+        if max_results is not None:
+            merged = islice(merged, max_results)
+        return list(merged)
+
+    def _master_instances(self, master: Dict[str, Any], overridden: set,
+                          window_start: datetime, window_end: Optional[datetime],
+                          default_tz) -> Iterator[Tuple[datetime, Dict[str, Any]]]:
+        """Yield (start, instance) for one recurring master"""
+        all_day = 'date' in master['start']
+        event_tz = tz.gettz(master['start'].get('timeZone')) or default_tz
+        start = parse_event_time(master['start'], event_tz).astimezone(event_tz)
+        duration = parse_event_time(master['end'], event_tz) - start
+
+        for occurrence in self._occurrences(master, start, duration, all_day,
+                                            event_tz, window_start, window_end):
+            suffix = _instance_suffix(occurrence, all_day)
+            if (master['id'], suffix) in overridden:
+                continue
+            yield occurrence, self._build_instance(master, occurrence, duration, all_day, suffix)
+
+    def _occurrences(self, master: Dict[str, Any], start: datetime, duration: timedelta,
+                     all_day: bool, event_tz, window_start: datetime,
+                     window_end: Optional[datetime]) -> Iterator[datetime]:
+        """Occurrence starts overlapping the window, cached when the window is bounded"""
+        key = (master['id'], master.get('etag'), window_start, window_end)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return iter(cached)
+
+        # All-day rules are floating dates; expand them naively to match UNTIL/EXDATE values
+        dtstart = start.replace(tzinfo=None) if all_day else start
+        lines = [_normalize_until(line, all_day, event_tz) for line in master['recurrence']]
+        rules = rrulestr('\n'.join(lines), dtstart=dtstart, forceset=True)
+
+        def localize(value: datetime) -> datetime:
+            return value.replace(tzinfo=event_tz) if value.tzinfo is None else value
+
+        after = window_start - duration
+        if all_day:
+            after = after.astimezone(event_tz).replace(tzinfo=None)
+        stream = (localize(value) for value in rules.xafter(after, inc=False))
+        if window_end is None:
+            return stream
+
+        bounded = tuple(takewhile(lambda value: value < window_end, stream))
+        with self._lock:
+            self._cache[key] = bounded
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return iter(bounded)
+
+    def _build_instance(self, master: Dict[str, Any], occurrence: datetime, duration: timedelta,
+                        all_day: bool, suffix: str) -> Dict[str, Any]:
+        """Build an instance resource shaped like the API's singleEvents output"""
+        instance = {key: value for key, value in master.items() if key != 'recurrence'}
+        instance['id'] = f"{master['id']}_{suffix}"
+        instance['recurringEventId'] = master['id']
+        end = occurrence + duration
+        if all_day:
+            instance['start'] = {'date': occurrence.date().isoformat()}
+            instance['end'] = {'date': end.date().isoformat()}
+            instance['originalStartTime'] = {'date': occurrence.date().isoformat()}
+        else:
+            time_zone = master['start'].get('timeZone')
+            instance['start'] = {'dateTime': occurrence.isoformat()}
+            instance['end'] = {'dateTime': end.isoformat()}
+            instance['originalStartTime'] = {'dateTime': occurrence.isoformat()}
+            if time_zone:
+                for field in ('start', 'end', 'originalStartTime'):
+                    instance[field]['timeZone'] = time_zone
+        return instance
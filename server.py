@@ -6,19 +6,42 @@ Provides access to Google Calendar and Gmail APIs through MCP protocol
 
 import json
 import os
+import asyncio
 import base64
+import contextlib
 import email
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+import hashlib
+import hmac
+import ipaddress
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
 
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import MediaIoBaseUpload
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+from attachments import (ATTACHMENTS_DIR, CHUNK_SIZE, AttachmentStore, find_attachments,
+                         without_attachment_data, write_mime_message)
+from cache import LRUCache
+from conflicts import find_conflicts
+from email_todos import DEFAULT_QUERY, EmailTodoPipeline, message_body_text
+from models import EventRecord
+from prefetch import Prefetcher
+from profiling import profiled
+from recurrence import RecurrenceExpander
+from shards import fetch_sharded, list_all_events, parse_rfc3339, window_days
+from singleflight import SingleFlight, coalesced
+from transport import HttpPool, api_executor
+
 from mcp.server import Server
 from mcp.types import (
     Resource,
@@ -42,12 +65,79 @@ SCOPES = ['https://www.googleapis.com/auth/calendar.readonly',
 TOKEN_FILE = 'token.json'
 CREDENTIALS_FILE = 'credentials.json'
 
+# Named accounts keep their tokens in ACCOUNTS_DIR/<account>.json;
+# the default account uses TOKEN_FILE
+ACCOUNTS_DIR = 'accounts'
+DEFAULT_ACCOUNT = 'default'
+
+# Account clients kept warm at once, and how long an unused one is kept (seconds)
+MAX_ACCOUNTS = 32
+ACCOUNT_IDLE_SECONDS = 1800
+
+# Number of event resources kept for ETag revalidation
+EVENT_CACHE_SIZE = 512
+
+# Number of Gmail message/thread details kept in memory
+MESSAGE_CACHE_SIZE = 1024
+THREAD_CACHE_SIZE = 256
+
+# Approximate bytes one account's caches may hold, split between events,
+# messages, threads and listings; named accounts get a smaller budget
+ACCOUNT_CACHE_BYTES = 32 * 1024 * 1024
+NAMED_ACCOUNT_CACHE_BYTES = 4 * 1024 * 1024
+
+# Gmail REST endpoint used for streamed attachment downloads
+GMAIL_API_URL = 'https://gmail.googleapis.com/gmail/v1/users/me'
+
+# Listing responses (events, message ids, calendars) are reused for this many
+# seconds; the background warmer refreshes them before they expire
+RESPONSE_TTL = 300
+CALENDAR_LIST_TTL = 900
+RESPONSE_CACHE_SIZE = 128
+
+# Gmail's limit on message ids per batchModify call
+BATCH_MODIFY_LIMIT = 1000
+
+# Outgoing messages larger than this are sent with a resumable media upload
+RESUMABLE_UPLOAD_THRESHOLD = 5 * 1024 * 1024
+
+# Resumable upload chunk size (a multiple of 256 KiB) and retries per chunk
+UPLOAD_CHUNK_SIZE = 2 * 1024 * 1024
+UPLOAD_RETRIES = 3
+
+# list_events over a window wider than this, asking for more results than
+# one API page, reads the window in concurrent shards
+SHARDED_LIST_DAYS = 90
+SHARDED_LIST_MIN_RESULTS = 250
+WINDOW_TOKEN_PREFIX = 'window:'
+
+# expand_recurring without a time_max expands this many days from time_min
+EXPANDED_LIST_DAYS = 90
+
+# Headers fetched for metadata-only message details
+METADATA_HEADERS = ['Subject', 'From', 'To', 'Date']
+
 app = Server("google-services")
 
 class GoogleServicesClient:
-    def __init__(self):
+    def __init__(self, token_file: str = TOKEN_FILE, sign_in: bool = True,
+                 cache_bytes: int = ACCOUNT_CACHE_BYTES):
+        self.token_file = token_file
+        self.sign_in = sign_in
+        self.credentials = None
         self.calendar_service = None
         self.gmail_service = None
+        self.http_pool = None
+        self._cache_lock = threading.RLock()
+        self._event_cache = LRUCache(EVENT_CACHE_SIZE, cache_bytes // 8)
+        self._message_cache = LRUCache(MESSAGE_CACHE_SIZE, cache_bytes * 3 // 8)
+        self._thread_cache = LRUCache(THREAD_CACHE_SIZE, cache_bytes // 8)
+        self._response_cache = LRUCache(RESPONSE_CACHE_SIZE, cache_bytes * 3 // 8)
+        self._time_min_anchor: Optional[Tuple[float, str]] = None
+        self._refreshing = threading.local()
+        self.recurrence_expander = RecurrenceExpander()
+        # Concurrent identical reads share one API request
+        self.single_flight = SingleFlight()
         self._authenticate()
     
     def _authenticate(self):
@@ -55,14 +145,16 @@ class GoogleServicesClient:
         creds = None
         
         # Load existing token
-        if os.path.exists(TOKEN_FILE):
-            creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+        if os.path.exists(self.token_file):
+            creds = Credentials.from_authorized_user_file(self.token_file, SCOPES)
         
         # If no valid credentials, run OAuth flow
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
                 creds.refresh(Request())
             else:
+                if not self.sign_in:
+                    raise Exception(f"No valid token in {self.token_file}; enroll the account again with --enroll")
                 if not os.path.exists(CREDENTIALS_FILE):
                     raise FileNotFoundError(f"Please place your Google credentials file at {CREDENTIALS_FILE}")
                 
@@ -71,32 +163,145 @@ class GoogleServicesClient:
                 creds = flow.run_local_server(port=0)
             
             # Save credentials for future use
-            with open(TOKEN_FILE, 'w') as token:
+            if os.path.dirname(self.token_file):
+                os.makedirs(os.path.dirname(self.token_file), exist_ok=True)
+            with open(self.token_file, 'w') as token:
                 token.write(creds.to_json())
         
-        self.calendar_service = build('calendar', 'v3', credentials=creds)
-        self.gmail_service = build('gmail', 'v1', credentials=creds)
+        self.credentials = creds
+        self.http_pool = HttpPool(creds)
+        self.calendar_service = self.http_pool.build('calendar', 'v3')
+        self.gmail_service = self.http_pool.build('gmail', 'v1')
+    
+    def _remember_event(self, calendar_id: str, event: Dict[str, Any]):
+        """Keep an event resource (and its etag) for conditional reads"""
+        self._remember(self._event_cache, (calendar_id, event.get('id')), event)
     
+    @coalesced
     def list_events(self, calendar_id: str = 'primary', max_results: int = 10, 
-                   time_min: Optional[str] = None, time_max: Optional[str] = None) -> List[Dict[str, Any]]:
-        """List events from a calendar"""
+                   time_min: Optional[str] = None, time_max: Optional[str] = None,
+                   expand_recurring: bool = False,
+                   page_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List events from a calendar
+        
+        Returns the events and the token for the next page (None on the last page).
+        With expand_recurring, recurring masters and their exceptions are
+        fetched once and expanded locally instead of one resource per instance;
+        without time_max the window ends EXPANDED_LIST_DAYS after time_min.
+        Wide windows are read in concurrent shards (see events_in_window).
+        """
         try:
             if not time_min:
-                time_min = datetime.utcnow().isoformat() + 'Z'
+                time_min = self.default_time_min()
             
-            events_result = self.calendar_service.events().list(
-                calendarId=calendar_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                maxResults=max_results,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
+            if expand_recurring:
+                if not time_max:
+                    time_max = (parse_rfc3339(time_min) + timedelta(days=EXPANDED_LIST_DAYS)).isoformat()
+                return self._list_events_expanded(calendar_id, max_results, time_min, time_max, page_token)
             
-            return events_result.get('items', [])
+            if page_token and page_token.startswith(WINDOW_TOKEN_PREFIX) or (
+                    not page_token and time_max and max_results > SHARDED_LIST_MIN_RESULTS
+                    and window_days(time_min, time_max) > SHARDED_LIST_DAYS):
+                return self._list_events_sharded(calendar_id, max_results, time_min, time_max, page_token)
+            
+            events_result = self._cached_response(
+                ('events', calendar_id, time_min, time_max, max_results, page_token), RESPONSE_TTL,
+                lambda: self.calendar_service.events().list(
+                    calendarId=calendar_id,
+                    timeMin=time_min,
+                    timeMax=time_max,
+                    maxResults=max_results,
+                    singleEvents=True,
+                    orderBy='startTime',
+                    pageToken=page_token
+                ).execute()
+            )
+            
+            items = self._drop_ended(time_min, events_result.get('items', []))
+            return items, events_result.get('nextPageToken')
+        except HttpError as error:
+            raise Exception(f"An error occurred: {error}")
+    
+    def _list_events_expanded(self, calendar_id: str, max_results: int, time_min: str,
+                              time_max: str,
+                              page_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Fetch masters/exceptions for the window and expand recurrences locally
+        
+        The page token is the offset into the expanded instances. Later pages
+        reuse the masters and exceptions the first page fetched.
+        """
+        items, calendar_tz = self._cached_response(
+            ('events', calendar_id, time_min, time_max, 'masters'), RESPONSE_TTL,
+            lambda: self._recurring_items(calendar_id, time_min, time_max),
+            reuse=bool(page_token)
+        )
+        
+        offset = int(page_token) if page_token else 0
+        # One extra instance tells whether another page exists
+        instances = self.recurrence_expander.expand(
+            items, time_min, time_max, calendar_tz=calendar_tz, max_results=offset + max_results + 1
+        )
+        next_token = str(offset + max_results) if len(instances) > offset + max_results else None
+        return instances[offset:offset + max_results], next_token
+    
+    def _recurring_items(self, calendar_id: str, time_min: str,
+                         time_max: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Every page of recurring masters, exceptions and single events in a window"""
+        return list_all_events(self.calendar_service, calendarId=calendar_id, timeMin=time_min,
+                               timeMax=time_max, singleEvents=False)
+    
+    def _list_events_sharded(self, calendar_id: str, max_results: int, time_min: str, time_max: str,
+                             page_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Page through the whole window's events; the page token is an offset"""
+        items, _ = self.events_in_window(calendar_id, time_min, time_max, reuse=bool(page_token))
+        offset = int(page_token[len(WINDOW_TOKEN_PREFIX):]) if page_token else 0
+        next_token = f"{WINDOW_TOKEN_PREFIX}{offset + max_results}" if len(items) > offset + max_results else None
+        return items[offset:offset + max_results], next_token
+    
+    @coalesced
+    def events_in_window(self, calendar_id: str, time_min: str, time_max: str,
+                         reuse: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """All single events in a window, plus the calendar's time zone
+        
+        Wide windows are split into shards that are listed concurrently and
+        merged back into start-time order. With reuse, a recent snapshot of
+        the same window is returned instead of fetching it again.
+        """
+        try:
+            return self._cached_response(
+                ('events', calendar_id, time_min, time_max, 'window'), RESPONSE_TTL,
+                lambda: fetch_sharded(
+                    lambda shard_min, shard_max: self._events_in_shard(calendar_id, shard_min, shard_max),
+                    time_min, time_max
+                ),
+                reuse=reuse
+            )
         except HttpError as error:
             raise Exception(f"An error occurred: {error}")
     
+    def _events_in_shard(self, calendar_id: str, time_min: str,
+                         time_max: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Every page of single events in one shard"""
+        return list_all_events(self.calendar_service, calendarId=calendar_id, timeMin=time_min,
+                               timeMax=time_max, singleEvents=True, orderBy='startTime')
+    
+    def find_conflicts(self, calendar_ids: Optional[List[str]] = None, time_min: Optional[str] = None,
+                       time_max: Optional[str] = None, include_all_day: bool = False) -> Dict[str, Any]:
+        """Find overlapping events across calendars (default: primary, next 7 days)
+        
+        Bounds without a UTC offset are taken as UTC.
+        """
+        start = parse_rfc3339(time_min) if time_min else datetime.now(timezone.utc)
+        end = parse_rfc3339(time_max) if time_max else start + timedelta(days=7)
+        # The Calendar API rejects timeMin/timeMax without an offset
+        time_min, time_max = start.isoformat(), end.isoformat()
+        
+        events_by_calendar = {
+            calendar_id: self.events_in_window(calendar_id, time_min, time_max)
+            for calendar_id in (calendar_ids or ['primary'])
+        }
+        return find_conflicts(events_by_calendar, include_all_day)
+    
     def create_event(self, calendar_id: str = 'primary', **event_data) -> Dict[str, Any]:
         """Create a new calendar event"""
         try:
@@ -104,21 +309,156 @@ class GoogleServicesClient:
                 calendarId=calendar_id,
                 body=event_data
             ).execute()
+            self._remember_event(calendar_id, event)
+            self._invalidate_responses('events')
             return event
         except HttpError as error:
             raise Exception(f"An error occurred: {error}")
     
-    def update_event(self, event_id: str, calendar_id: str = 'primary', **event_data) -> Dict[str, Any]:
-        """Update an existing calendar event"""
+    def _remember(self, cache: LRUCache, key, value):
+        """Insert into an LRU cache, evicting the oldest entries past its bounds"""
+        with self._cache_lock:
+            cache.put(key, value)
+    
+    def _recall(self, cache: LRUCache, key) -> Optional[Any]:
+        """Look up an LRU cache entry, marking it recently used"""
+        with self._cache_lock:
+            return cache.get(key)
+    
+    def _cached_response(self, key: Tuple, ttl: float, fetch, reuse: bool = False):
+        """Return a kept listing response younger than ttl seconds, or fetch and keep it
+        
+        Foreground calls are only served responses the background warmer
+        fetched, or with reuse (later pages of an offset-paged listing) the
+        snapshot an earlier page took. Everything else goes to the API, so
+        with prefetch off first pages are always fresh.
+        """
+        refreshing = self._is_refreshing()
+        entry = self._recall(self._response_cache, key)
+        if (entry is not None and not refreshing and time.monotonic() - entry[0] < ttl
+                and (entry[2] or reuse)):
+            return entry[1]
+        value = fetch()
+        self._remember(self._response_cache, key, (time.monotonic(), value, refreshing))
+        return value
+    
+    def _is_refreshing(self) -> bool:
+        return getattr(self._refreshing, 'active', False)
+    
+    @contextlib.contextmanager
+    def refreshing(self):
+        """Within this block (on this thread) listing calls bypass and renew the cache"""
+        self._refreshing.active = True
         try:
-            event = self.calendar_service.events().update(
+            yield
+        finally:
+            self._refreshing.active = False
+    
+    def _invalidate_responses(self, kind: str):
+        """Drop cached listing responses of one kind after a write"""
+        with self._cache_lock:
+            for key in self._response_cache.keys():
+                if key[0] == kind:
+                    self._response_cache.pop(key)
+            if kind == 'events':
+                self._time_min_anchor = None
+    
+    def default_time_min(self) -> str:
+        """'Now' for upcoming-event queries
+        
+        The warmer's upcoming-event listing is keyed by the timestamp it was
+        fetched with. While that listing is fresh, foreground queries reuse
+        the timestamp so they can be served from it, and list_events hides
+        events that have ended since. Otherwise this is the current time.
+        """
+        now = datetime.utcnow().isoformat() + 'Z'
+        with self._cache_lock:
+            if self._is_refreshing():
+                self._time_min_anchor = (time.monotonic(), now)
+                return now
+            anchor = self._time_min_anchor
+            if anchor is not None and time.monotonic() - anchor[0] < RESPONSE_TTL:
+                return anchor[1]
+            return now
+    
+    def _drop_ended(self, time_min: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Hide timed events that ended after a reused default time_min"""
+        anchor = self._time_min_anchor
+        if anchor is None or time_min != anchor[1]:
+            return items
+        now = datetime.now(timezone.utc)
+        return [event for event in items
+                if 'dateTime' not in event.get('end', {}) or parse_rfc3339(event['end']['dateTime']) > now]
+    
+    @coalesced
+    def message_detail(self, message_id: str, format: str = 'full',
+                       attachment_data: bool = False) -> Dict[str, Any]:
+        """Get a message, reading through the detail cache
+        
+        A cached 'full' message also satisfies 'metadata' requests. Cached
+        copies leave out inline attachment data; with attachment_data a copy
+        missing it is fetched again.
+        """
+        for key in ((message_id, 'full'), (message_id, format)):
+            cached = self._recall(self._message_cache, key)
+            if cached is not None and not (attachment_data and cached.get('_attachment_data_dropped')):
+                return cached
+        
+        if format == 'metadata':
+            message = self.gmail_service.users().messages().get(
+                userId='me', id=message_id, format='metadata',
+                metadataHeaders=METADATA_HEADERS
+            ).execute()
+        else:
+            message = self.gmail_service.users().messages().get(
+                userId='me', id=message_id, format=format
+            ).execute()
+        self._remember(self._message_cache, (message_id, format), without_attachment_data(message))
+        return message
+    
+    @coalesced
+    def get_event(self, event_id: str, calendar_id: str = 'primary') -> Dict[str, Any]:
+        """Get a calendar event, revalidating any cached copy with If-None-Match"""
+        cached = self._recall(self._event_cache, (calendar_id, event_id))
+        try:
+            request = self.calendar_service.events().get(
+                calendarId=calendar_id,
+                eventId=event_id
+            )
+            if cached and cached.get('etag'):
+                request.headers['If-None-Match'] = cached['etag']
+            event = request.execute()
+        except HttpError as error:
+            # 304 Not Modified: the cached copy is still current
+            if cached and error.resp.status == 304:
+                return cached
+            raise Exception(f"An error occurred: {error}")
+        self._remember_event(calendar_id, event)
+        return event
+    
+    def update_event(self, event_id: str, calendar_id: str = 'primary',
+                     etag: Optional[str] = None, **event_data) -> Dict[str, Any]:
+        """Patch an existing calendar event, sending only the given fields
+        
+        If etag is given the write is conditional (If-Match) and is rejected
+        when the event has changed since that version was read.
+        """
+        try:
+            request = self.calendar_service.events().patch(
                 calendarId=calendar_id,
                 eventId=event_id,
                 body=event_data
-            ).execute()
-            return event
+            )
+            if etag:
+                request.headers['If-Match'] = etag
+            event = request.execute()
         except HttpError as error:
+            if etag and error.resp.status == 412:
+                raise Exception(f"Event {event_id} has changed since etag {etag}; fetch it again before updating")
             raise Exception(f"An error occurred: {error}")
+        self._remember_event(calendar_id, event)
+        self._invalidate_responses('events')
+        return event
     
     def delete_event(self, event_id: str, calendar_id: str = 'primary') -> bool:
         """Delete a calendar event"""
@@ -127,50 +467,60 @@ class GoogleServicesClient:
                 calendarId=calendar_id,
                 eventId=event_id
             ).execute()
+            with self._cache_lock:
+                self._event_cache.pop((calendar_id, event_id), None)
+            self._invalidate_responses('events')
             return True
         except HttpError as error:
             raise Exception(f"An error occurred: {error}")
     
+    @coalesced
     def list_calendars(self) -> List[Dict[str, Any]]:
         """List all calendars"""
         try:
-            calendar_list = self.calendar_service.calendarList().list().execute()
+            calendar_list = self._cached_response(
+                ('calendars',), CALENDAR_LIST_TTL,
+                lambda: self.calendar_service.calendarList().list().execute()
+            )
             return calendar_list.get('items', [])
         except HttpError as error:
             raise Exception(f"An error occurred: {error}")
     
-    def list_messages(self, query: str = '', max_results: int = 10) -> List[Dict[str, Any]]:
-        """List Gmail messages"""
+    @coalesced
+    def list_messages(self, query: str = '', max_results: int = 10,
+                      page_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """List Gmail messages
+        
+        Returns the messages and the token for the next page (None on the last page).
+        """
         try:
-            result = self.gmail_service.users().messages().list(
-                userId='me', q=query, maxResults=max_results
-            ).execute()
+            result = self._cached_response(
+                ('messages', query, max_results, page_token), RESPONSE_TTL,
+                lambda: self.gmail_service.users().messages().list(
+                    userId='me', q=query, maxResults=max_results, pageToken=page_token
+                ).execute()
+            )
             messages = result.get('messages', [])
             
             # Get details for each message
-            detailed_messages = []
-            for msg in messages:
-                msg_detail = self.gmail_service.users().messages().get(
-                    userId='me', id=msg['id'], format='full'
-                ).execute()
-                detailed_messages.append(msg_detail)
-            
-            return detailed_messages
+            detailed = [self.message_detail(msg['id'], 'full') for msg in messages]
+            return detailed, result.get('nextPageToken')
         except HttpError as error:
             raise Exception(f"An error occurred: {error}")
     
+    @coalesced
     def get_message(self, message_id: str) -> Dict[str, Any]:
         """Get a specific Gmail message"""
         try:
-            message = self.gmail_service.users().messages().get(
-                userId='me', id=message_id, format='full'
-            ).execute()
-            return message
+            return self.message_detail(message_id, 'full')
         except HttpError as error:
             raise Exception(f"An error occurred: {error}")
     
-    def send_message(self, to: str, subject: str, body: str, body_type: str = 'plain') -> Dict[str, Any]:
-        """Send a Gmail message"""
+    def send_message(self, to: str, subject: str, body: str, body_type: str = 'plain',
+                     attachments: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Send a Gmail message, optionally with files attached"""
+        if attachments:
+            return self._send_with_attachments(to, subject, body, body_type, attachments)
         try:
             if body_type == 'html':
                 message = MIMEMultipart('alternative')
@@ -188,39 +538,411 @@ class GoogleServicesClient:
             sent_message = self.gmail_service.users().messages().send(
                 userId='me', body={'raw': raw_message}
             ).execute()
+            self._invalidate_responses('messages')
             
             return sent_message
         except HttpError as error:
             raise Exception(f"An error occurred: {error}")
     
-    def search_messages(self, query: str, max_results: int = 20) -> List[Dict[str, Any]]:
-        """Search Gmail messages with advanced query"""
+    def _send_with_attachments(self, to: str, subject: str, body: str, body_type: str,
+                               attachments: List[str]) -> Dict[str, Any]:
+        """Send a message whose MIME source is spooled to a temporary file
+        
+        Small messages go out as a raw JSON body. Larger ones use Gmail's
+        resumable media upload, so only one chunk is in memory at a time and
+        a failed chunk is retried from the last offset the server confirmed.
+        """
         try:
-            result = self.gmail_service.users().messages().list(
-                userId='me', q=query, maxResults=max_results
-            ).execute()
+            with tempfile.TemporaryFile() as spool:
+                size = write_mime_message(spool, to, subject, body, body_type, attachments)
+                spool.seek(0)
+                messages = self.gmail_service.users().messages()
+                
+                if size <= RESUMABLE_UPLOAD_THRESHOLD:
+                    raw_message = base64.urlsafe_b64encode(spool.read()).decode('utf-8')
+                    sent_message = messages.send(userId='me', body={'raw': raw_message}).execute(
+                        num_retries=UPLOAD_RETRIES
+                    )
+                else:
+                    media = MediaIoBaseUpload(spool, mimetype='message/rfc822',
+                                              chunksize=UPLOAD_CHUNK_SIZE, resumable=True)
+                    request = messages.send(userId='me', media_body=media)
+                    sent_message = None
+                    while sent_message is None:
+                        _, sent_message = request.next_chunk(num_retries=UPLOAD_RETRIES)
+            self._invalidate_responses('messages')
+            
+            return sent_message
+        except HttpError as error:
+            raise Exception(f"An error occurred: {error}")
+    
+    @coalesced
+    def search_messages(self, query: str, max_results: int = 20,
+                        page_token: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Search Gmail messages with advanced query
+        
+        Returns metadata for every message on the page and the next page token.
+        """
+        try:
+            result = self._cached_response(
+                ('messages', query, max_results, page_token), RESPONSE_TTL,
+                lambda: self.gmail_service.users().messages().list(
+                    userId='me', q=query, maxResults=max_results, pageToken=page_token
+                ).execute()
+            )
             messages = result.get('messages', [])
             
             # Get basic details for search results
-            detailed_messages = []
-            for msg in messages[:10]:  # Limit detailed fetch to first 10
-                msg_detail = self.gmail_service.users().messages().get(
-                    userId='me', id=msg['id'], format='metadata',
-                    metadataHeaders=['Subject', 'From', 'Date']
+            detailed = [self.message_detail(msg['id'], 'metadata') for msg in messages]
+            return detailed, result.get('nextPageToken')
+        except HttpError as error:
+            raise Exception(f"An error occurred: {error}")
+    
+    def resolve_message_ids(self, query: str, max_messages: int) -> Tuple[List[str], bool]:
+        """Message ids matching a search query, up to max_messages
+        
+        Also returns whether the cap cut the results short.
+        """
+        ids = []
+        page_token = None
+        while len(ids) < max_messages:
+            result = self.gmail_service.users().messages().list(
+                userId='me', q=query, maxResults=min(500, max_messages - len(ids)),
+                pageToken=page_token
+            ).execute()
+            ids.extend(msg['id'] for msg in result.get('messages', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                break
+        return ids[:max_messages], page_token is not None
+    
+    def _label_ids(self, labels: List[str]) -> List[str]:
+        """Map label names to ids; system labels (UNREAD, INBOX, ...) and ids pass through"""
+        if not labels:
+            return []
+        result = self.gmail_service.users().labels().list(userId='me').execute()
+        by_name = {label['name'].lower(): label['id'] for label in result.get('labels', [])}
+        known_ids = set(by_name.values())
+        label_ids = []
+        for label in labels:
+            if label in known_ids:
+                label_ids.append(label)
+            elif label.lower() in by_name:
+                label_ids.append(by_name[label.lower()])
+            else:
+                raise Exception(f"Unknown Gmail label: {label}")
+        return label_ids
+    
+    def modify_messages(self, message_ids: Optional[List[str]] = None, query: Optional[str] = None,
+                        add_labels: Optional[List[str]] = None, remove_labels: Optional[List[str]] = None,
+                        max_messages: int = 5000) -> Dict[str, Any]:
+        """Add/remove labels on many messages with batchModify
+        
+        Messages are given by id or by a search query. Ids are sent in chunks
+        of BATCH_MODIFY_LIMIT, several chunks at a time. If only some chunks
+        fail, the counts of both are returned along with the errors.
+        'truncated' says the query matched more than max_messages messages.
+        """
+        try:
+            ids = list(message_ids or [])
+            truncated = False
+            if query:
+                query_ids, truncated = self.resolve_message_ids(query, max_messages)
+                ids.extend(query_ids)
+            ids = list(dict.fromkeys(ids))
+            body = {}
+            if add_labels:
+                body['addLabelIds'] = self._label_ids(add_labels)
+            if remove_labels:
+                body['removeLabelIds'] = self._label_ids(remove_labels)
+            if not body:
+                raise Exception("Nothing to change: give add_labels and/or remove_labels")
+            
+            chunks = [ids[i:i + BATCH_MODIFY_LIMIT] for i in range(0, len(ids), BATCH_MODIFY_LIMIT)]
+            
+            def modify(chunk: List[str]):
+                self.gmail_service.users().messages().batchModify(
+                    userId='me', body=dict(body, ids=chunk)
                 ).execute()
-                detailed_messages.append(msg_detail)
             
-            return detailed_messages
+            futures = [api_executor().submit(modify, chunk) for chunk in chunks]
+            modified = 0
+            failed_ids = 0
+            errors = []
+            try:
+                for chunk, future in zip(chunks, futures):
+                    try:
+                        future.result()
+                        modified += len(chunk)
+                    except HttpError as error:
+                        failed_ids += len(chunk)
+                        errors.append(str(error))
+            finally:
+                # Cached details carry the old labels (failed chunks may be partly applied)
+                with self._cache_lock:
+                    for message_id in ids:
+                        self._message_cache.pop((message_id, 'full'), None)
+                        self._message_cache.pop((message_id, 'metadata'), None)
+                    self._thread_cache.clear()
+                self._invalidate_responses('messages')
+            
+            if errors and not modified:
+                raise Exception(f"An error occurred: {errors[0]}")
+            return {
+                'modified': modified,
+                'requests': len(chunks),
+                'failed': failed_ids,
+                'failed_requests': len(errors),
+                'errors': errors,
+                'truncated': truncated
+            }
+        except HttpError as error:
+            raise Exception(f"An error occurred: {error}")
+    
+    @coalesced
+    def list_attachments(self, message_id: str) -> List[Dict[str, Any]]:
+        """List the attachments of a Gmail message"""
+        try:
+            message = self.message_detail(message_id, 'full', attachment_data=True)
+            return find_attachments(message)
         except HttpError as error:
             raise Exception(f"An error occurred: {error}")
+    
+    def download_attachments(self, message_id: str, part_id: Optional[str] = None,
+                             directory: str = ATTACHMENTS_DIR) -> List[Dict[str, Any]]:
+        """Stream a message's attachments (or just part_id) to directory
+        
+        Attachments already downloaded with a matching hash are skipped.
+        """
+        attachments = self.list_attachments(message_id)
+        if part_id is not None:
+            attachments = [a for a in attachments if a['part_id'] == part_id]
+            if not attachments:
+                raise Exception(f"Message {message_id} has no attachment with part ID {part_id}")
+        
+        store = AttachmentStore(directory)
+        results = []
+        for attachment in attachments:
+            existing = store.existing(f"{message_id}:{attachment['part_id']}")
+            if existing:
+                results.append(dict(existing, skipped=True))
+                continue
+            
+            if not attachment['attachment_id']:
+                entry = store.save(message_id, attachment)
+            else:
+                url = f"{GMAIL_API_URL}/messages/{message_id}/attachments/{attachment['attachment_id']}"
+                with self.http_pool.session().get(url, params={'fields': 'data'}, stream=True) as response:
+                    if response.status_code >= 400:
+                        raise Exception(f"An error occurred: {response.status_code} {response.text[:200]}")
+                    entry = store.save(message_id, attachment, response.iter_content(chunk_size=CHUNK_SIZE))
+            results.append(dict(entry, skipped=False))
+        return results
+    
+    @coalesced
+    def get_thread(self, thread_id: str, format: str = 'metadata',
+                   history_id: Optional[str] = None) -> Dict[str, Any]:
+        """Get a Gmail thread with all its messages in one request
+        
+        A cached thread is reused while its historyId matches history_id.
+        Its messages are added to the message detail cache.
+        """
+        try:
+            cached = self._recall(self._thread_cache, thread_id)
+            if (cached is not None and history_id and cached.get('historyId') == history_id
+                    and (format != 'full' or cached.get('_format') == 'full')):
+                return cached
+            
+            if format == 'metadata':
+                thread = self.gmail_service.users().threads().get(
+                    userId='me', id=thread_id, format='metadata',
+                    metadataHeaders=METADATA_HEADERS
+                ).execute()
+            else:
+                thread = self.gmail_service.users().threads().get(
+                    userId='me', id=thread_id, format=format
+                ).execute()
+            thread['_format'] = format
+            
+            messages = [without_attachment_data(message) for message in thread.get('messages', [])]
+            self._remember(self._thread_cache, thread_id, dict(thread, messages=messages))
+            for message in messages:
+                self._remember(self._message_cache, (message['id'], format), message)
+            return thread
+        except HttpError as error:
+            raise Exception(f"An error occurred: {error}")
+    
+    @coalesced
+    def list_threads(self, query: str = '', max_results: int = 10) -> List[Dict[str, Any]]:
+        """List Gmail threads with their messages (metadata only)"""
+        try:
+            result = self.gmail_service.users().threads().list(
+                userId='me', q=query, maxResults=max_results
+            ).execute()
+            return [self.get_thread(thread['id'], 'metadata', thread.get('historyId'))
+                    for thread in result.get('threads', [])]
+        except HttpError as error:
+            raise Exception(f"An error occurred: {error}")
+
+def encode_cursor(scope: Dict[str, Any], **position) -> str:
+    """Build an opaque page cursor bound to the query it was issued for"""
+    fingerprint = hashlib.sha1(json.dumps(scope, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    payload = json.dumps(dict(position, q=fingerprint), separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: Optional[str], scope: Dict[str, Any]) -> Dict[str, Any]:
+    """Decode a page cursor, rejecting cursors issued for a different query"""
+    if not cursor:
+        return {}
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded).decode('utf-8'))
+    except ValueError:
+        raise Exception("Invalid cursor")
+    fingerprint = hashlib.sha1(json.dumps(scope, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    if position.pop('q', None) != fingerprint:
+        raise Exception("Cursor does not match this query; repeat the original arguments")
+    return position
+
+def compact_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Only the event fields an agent needs, for JSON output"""
+    record = EventRecord.from_api(event, default_title='No title')
+    compact = {
+        'id': record.id,
+        'summary': record.summary,
+        'start': record.start,
+        'end': record.end
+    }
+    if record.location:
+        compact['location'] = record.location
+    return compact
+
+def compact_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+    """Only the message fields an agent needs, for JSON output"""
+    headers = {h['name']: h['value'] for h in msg.get('payload', {}).get('headers', [])}
+    return {
+        'id': msg.get('id'),
+        'thread_id': msg.get('threadId'),
+        'subject': headers.get('Subject', 'No subject'),
+        'from': headers.get('From', 'Unknown sender'),
+        'date': headers.get('Date', 'Unknown date')
+    }
+
+def json_page(key: str, items: List[Dict[str, Any]], next_cursor: Optional[str]) -> str:
+    """Serialize one page of compact results"""
+    return json.dumps({key: items, 'next_cursor': next_cursor}, separators=(',', ':'), ensure_ascii=False)
+
+def summarize_thread(thread: Dict[str, Any]) -> Dict[str, Any]:
+    """Compact per-thread summary: participants, message count and last message"""
+    participants = []
+    last_headers = {}
+    messages = thread.get('messages', [])
+    for msg in messages:
+        headers = {h['name']: h['value'] for h in msg.get('payload', {}).get('headers', [])}
+        sender = headers.get('From')
+        if sender and sender not in participants:
+            participants.append(sender)
+        last_headers = headers
+    
+    subject = 'No subject'
+    if messages:
+        first_headers = {h['name']: h['value'] for h in messages[0].get('payload', {}).get('headers', [])}
+        subject = first_headers.get('Subject', subject)
+    
+    return {
+        'id': thread.get('id'),
+        'subject': subject,
+        'participants': participants,
+        'count': len(messages),
+        'last_from': last_headers.get('From', 'Unknown sender'),
+        'last_date': last_headers.get('Date', 'Unknown date'),
+        'last_snippet': messages[-1].get('snippet', '') if messages else ''
+    }
+
+class ClientPool:
+    """Lazily built GoogleServicesClient per named account
+    
+    Clients are kept in an LRU of at most max_accounts and dropped after
+    idle_seconds without use. Named accounts must already be enrolled
+    (python server.py --enroll NAME); tool calls never start a sign-in.
+    """
+    
+    def __init__(self, max_accounts: int = MAX_ACCOUNTS, idle_seconds: float = ACCOUNT_IDLE_SECONDS):
+        self.max_accounts = max_accounts
+        self.idle_seconds = idle_seconds
+        self._clients: 'OrderedDict[str, Tuple[GoogleServicesClient, float]]' = OrderedDict()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def token_file(account: str) -> str:
+        """Token file for an account name"""
+        if account == DEFAULT_ACCOUNT:
+            return TOKEN_FILE
+        if not re.fullmatch(r'[A-Za-z0-9_.@-]+', account) or account.startswith('.'):
+            raise ValueError(f"Invalid account name: {account}")
+        return os.path.join(ACCOUNTS_DIR, f"{account}.json")
+    
+    def get(self, account: Optional[str] = None) -> GoogleServicesClient:
+        """Return the client for account, building it on first use"""
+        account = account or DEFAULT_ACCOUNT
+        with self._lock:
+            self._evict_idle()
+            entry = self._clients.get(account)
+            if entry is not None:
+                self._clients[account] = (entry[0], time.monotonic())
+                self._clients.move_to_end(account)
+                return entry[0]
+            build_lock = self._build_locks.setdefault(account, threading.Lock())
+        
+        # Build outside the pool lock so one slow sign-in doesn't stall other accounts
+        with build_lock:
+            with self._lock:
+                entry = self._clients.get(account)
+            if entry is not None:
+                return entry[0]
+            token_file = self.token_file(account)
+            if account != DEFAULT_ACCOUNT and not os.path.exists(token_file):
+                raise ValueError(f"Unknown account: {account}")
+            named = account != DEFAULT_ACCOUNT
+            client = GoogleServicesClient(token_file, sign_in=not named,
+                                          cache_bytes=NAMED_ACCOUNT_CACHE_BYTES if named else ACCOUNT_CACHE_BYTES)
+            with self._lock:
+                self._clients[account] = (client, time.monotonic())
+                self._clients.move_to_end(account)
+                while len(self._clients) > self.max_accounts:
+                    self._clients.popitem(last=False)
+            return client
+    
+    def _evict_idle(self):
+        """Drop clients unused for longer than idle_seconds (caller holds the lock)"""
+        cutoff = time.monotonic() - self.idle_seconds
+        idle = [name for name, (_, last_used) in self._clients.items() if last_used < cutoff]
+        for account in idle:
+            del self._clients[account]
+            self._build_locks.pop(account, None)
+    
+    def accounts(self) -> List[str]:
+        """Names of the accounts currently held in the pool"""
+        with self._lock:
+            return list(self._clients)
+
+# Google Services clients, one per account
+client_pool = ClientPool()
+
+# Warms the default account's agenda, inbox and calendar list in the background
+prefetcher = Prefetcher(client_pool.get)
+
+async def handle_initialized(notification: types.InitializedNotification):
+    """Start prefetching once a client has completed the MCP handshake"""
+    prefetcher.start()
 
-# Initialize Google Services client
-google_client = GoogleServicesClient()
+app.notification_handlers[types.InitializedNotification] = handle_initialized
 
 @app.list_tools()
 async def handle_list_tools() -> List[Tool]:
     """List available Google Calendar and Gmail tools"""
-    return [
+    tools = [
         Tool(
             name="list_events",
             description="List events from Google Calendar",
@@ -234,7 +956,7 @@ async def handle_list_tools() -> List[Tool]:
                     },
                     "max_results": {
                         "type": "integer",
-                        "description": "Maximum number of events to return",
+                        "description": "Maximum number of events to return per page",
                         "default": 10
                     },
                     "time_min": {
@@ -244,6 +966,20 @@ async def handle_list_tools() -> List[Tool]:
                     "time_max": {
                         "type": "string",
                         "description": "End time for events (ISO format)"
+                    },
+                    "expand_recurring": {
+                        "type": "boolean",
+                        "description": "Expand recurring events locally instead of fetching every instance (best for wide windows with time_max; without time_max the next 90 days)",
+                        "default": False
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor from a previous call to fetch the next page"
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "description": "Output format: 'markdown' or compact 'json'",
+                        "default": "markdown"
                     }
                 }
             }
@@ -283,9 +1019,28 @@ async def handle_list_tools() -> List[Tool]:
                 "required": ["summary", "start_time", "end_time"]
             }
         ),
+        Tool(
+            name="get_event",
+            description="Get a single Google Calendar event (revalidated by ETag when cached)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "event_id": {
+                        "type": "string",
+                        "description": "Event ID to fetch"
+                    },
+                    "calendar_id": {
+                        "type": "string",
+                        "description": "Calendar ID (default: primary)",
+                        "default": "primary"
+                    }
+                },
+                "required": ["event_id"]
+            }
+        ),
         Tool(
             name="update_event",
-            description="Update an existing Google Calendar event",
+            description="Update fields of an existing Google Calendar event (unspecified fields are left unchanged)",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -317,6 +1072,10 @@ async def handle_list_tools() -> List[Tool]:
                     "location": {
                         "type": "string",
                         "description": "Event location"
+                    },
+                    "etag": {
+                        "type": "string",
+                        "description": "Only apply the update if the event still has this ETag"
                     }
                 },
                 "required": ["event_id"]
@@ -349,6 +1108,38 @@ async def handle_list_tools() -> List[Tool]:
                 "properties": {}
             }
         ),
+        Tool(
+            name="find_conflicts",
+            description="Find overlapping (double-booked) events across calendars in a time window",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "calendar_ids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Calendar IDs to check (default: primary)"
+                    },
+                    "time_min": {
+                        "type": "string",
+                        "description": "Start of the window (ISO format, default: now)"
+                    },
+                    "time_max": {
+                        "type": "string",
+                        "description": "End of the window (ISO format, default: 7 days after time_min)"
+                    },
+                    "include_all_day": {
+                        "type": "boolean",
+                        "description": "Also treat all-day events as busy",
+                        "default": False
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "description": "Output format: 'markdown' or compact 'json'",
+                        "default": "markdown"
+                    }
+                }
+            }
+        ),
         Tool(
             name="list_messages",
             description="List Gmail messages",
@@ -361,8 +1152,17 @@ async def handle_list_tools() -> List[Tool]:
                     },
                     "max_results": {
                         "type": "integer",
-                        "description": "Maximum number of messages to return",
+                        "description": "Maximum number of messages to return per page",
                         "default": 10
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor from a previous call to fetch the next page"
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "description": "Output format: 'markdown' or compact 'json'",
+                        "default": "markdown"
                     }
                 }
             }
@@ -403,6 +1203,11 @@ async def handle_list_tools() -> List[Tool]:
                         "type": "string",
                         "description": "Body type: 'plain' or 'html'",
                         "default": "plain"
+                    },
+                    "attachments": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Paths of local files to attach"
                     }
                 },
                 "required": ["to", "subject", "body"]
@@ -420,34 +1225,223 @@ async def handle_list_tools() -> List[Tool]:
                     },
                     "max_results": {
                         "type": "integer",
-                        "description": "Maximum number of messages to return",
+                        "description": "Maximum number of messages to return per page",
                         "default": 20
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor from a previous call to fetch the next page"
+                    },
+                    "output_format": {
+                        "type": "string",
+                        "description": "Output format: 'markdown' or compact 'json'",
+                        "default": "markdown"
                     }
                 },
                 "required": ["query"]
             }
+        ),
+        Tool(
+            name="modify_messages",
+            description="Add or remove labels on many Gmail messages at once (e.g. remove UNREAD to mark read, remove INBOX to archive)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "message_ids": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Gmail message IDs to change"
+                    },
+                    "query": {
+                        "type": "string",
+                        "description": "Gmail search query; every matching message is changed"
+                    },
+                    "add_labels": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Label names or IDs to add (e.g. STARRED, IMPORTANT, Work)"
+                    },
+                    "remove_labels": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Label names or IDs to remove (e.g. UNREAD, INBOX)"
+                    },
+                    "max_messages": {
+                        "type": "integer",
+                        "description": "Maximum number of messages a query may change",
+                        "default": 5000
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="extract_todos_from_email",
+            description="Turn new matching Gmail messages into ToDoList.csv entries (each message is processed once)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Gmail search query for messages with action items",
+                        "default": DEFAULT_QUERY
+                    },
+                    "max_messages": {
+                        "type": "integer",
+                        "description": "Maximum number of new messages to scan (oldest first; the rest are left for the next run)",
+                        "default": 200
+                    },
+                    "require_keywords": {
+                        "type": "boolean",
+                        "description": "Only fetch bodies of messages whose subject/snippet looks like an action item",
+                        "default": True
+                    },
+                    "dry_run": {
+                        "type": "boolean",
+                        "description": "Show the todos that would be added without writing them",
+                        "default": False
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="list_attachments",
+            description="List the attachments of a Gmail message",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "message_id": {
+                        "type": "string",
+                        "description": "Gmail message ID"
+                    }
+                },
+                "required": ["message_id"]
+            }
+        ),
+        Tool(
+            name="download_attachment",
+            description="Download attachments of a Gmail message to a local directory (already downloaded files are skipped)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "message_id": {
+                        "type": "string",
+                        "description": "Gmail message ID"
+                    },
+                    "part_id": {
+                        "type": "string",
+                        "description": "Part ID from list_attachments (default: all attachments)"
+                    },
+                    "directory": {
+                        "type": "string",
+                        "description": "Directory to save attachments in",
+                        "default": ATTACHMENTS_DIR
+                    }
+                },
+                "required": ["message_id"]
+            }
+        ),
+        Tool(
+            name="list_threads",
+            description="List Gmail conversations with one compact summary per thread",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Gmail search query (optional)"
+                    },
+                    "max_results": {
+                        "type": "integer",
+                        "description": "Maximum number of threads to return",
+                        "default": 10
+                    }
+                }
+            }
+        ),
+        Tool(
+            name="get_thread",
+            description="Get all messages of a Gmail thread in one call",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "thread_id": {
+                        "type": "string",
+                        "description": "Gmail thread ID"
+                    }
+                },
+                "required": ["thread_id"]
+            }
+        ),
+        Tool(
+            name="request_stats",
+            description="Show how many concurrent identical API reads were shared instead of repeated",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
         )
     ]
+    
+    # Every tool can run against any configured account
+    for tool in tools:
+        tool.inputSchema["properties"]["account"] = {
+            "type": "string",
+            "description": f"Account name (default: {DEFAULT_ACCOUNT})"
+        }
+    return tools
 
 @app.call_tool()
 async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent]:
-    """Handle tool calls"""
+    """Handle tool calls
+    
+    Tools run on worker threads so concurrent calls don't block each other
+    or the event loop.
+    """
+    return await asyncio.to_thread(call_tool, name, arguments)
+
+def call_tool(name: str, arguments: dict) -> List[types.TextContent]:
+    """Run a tool call synchronously, profiled when MCP_PROFILE selects it"""
+    prefetcher.touch()
+    with profiled(f"tool:{name}"):
+        return _call_tool(name, arguments)
+
+def _call_tool(name: str, arguments: dict) -> List[types.TextContent]:
     try:
+        account = arguments.pop('account', None) or DEFAULT_ACCOUNT
+        google_client = client_pool.get(account)
+        
         if name == "list_events":
-            events = google_client.list_events(**arguments)
+            output_format = arguments.pop('output_format', 'markdown')
+            cursor = arguments.pop('cursor', None)
+            scope = dict(arguments, tool=name, account=account)
+            position = decode_cursor(cursor, scope)
+            if position:
+                # Page tokens are only valid for the time_min they were issued with
+                arguments['time_min'] = position['time_min']
+            elif not arguments.get('time_min'):
+                arguments['time_min'] = google_client.default_time_min()
+            
+            events, next_token = google_client.list_events(page_token=position.get('page_token'), **arguments)
+            next_cursor = None
+            if next_token:
+                next_cursor = encode_cursor(scope, page_token=next_token, time_min=arguments['time_min'])
+            
+            if output_format == 'json':
+                return [types.TextContent(type="text", text=json_page('events', [compact_event(e) for e in events], next_cursor))]
+            
             events_text = "📅 **Google Calendar Events**\n\n"
             
             if not events:
                 events_text += "No upcoming events found."
             else:
-                for event in events:
-                    start = event['start'].get('dateTime', event['start'].get('date'))
-                    summary = event.get('summary', 'No title')
-                    events_text += f"• **{summary}**\n"
-                    events_text += f"  📅 {start}\n"
-                    if event.get('description'):
-                        events_text += f"  📝 {event['description'][:100]}...\n"
+                for event in (EventRecord.from_api(e, default_title='No title') for e in events):
+                    events_text += f"• **{event.summary}**\n"
+                    events_text += f"  📅 {event.start}\n"
+                    if event.description:
+                        events_text += f"  📝 {event.description[:100]}...\n"
                     events_text += "\n"
+            if next_cursor:
+                events_text += f"➡️ More events available. Next cursor: {next_cursor}"
             
             return [types.TextContent(type="text", text=events_text)]
         
@@ -478,9 +1472,29 @@ async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent
                 text=f"✅ Event created successfully!\n\n**{event.get('summary')}**\nEvent ID: {event.get('id')}\nLink: {event.get('htmlLink')}"
             )]
         
+        elif name == "get_event":
+            event_id = arguments['event_id']
+            calendar_id = arguments.get('calendar_id', 'primary')
+            event = google_client.get_event(event_id, calendar_id)
+            
+            start = event.get('start', {})
+            end = event.get('end', {})
+            event_text = f"📅 **{event.get('summary', 'No title')}**\n\n"
+            event_text += f"**Start:** {start.get('dateTime', start.get('date'))}\n"
+            event_text += f"**End:** {end.get('dateTime', end.get('date'))}\n"
+            if event.get('location'):
+                event_text += f"**Location:** {event['location']}\n"
+            if event.get('description'):
+                event_text += f"**Description:** {event['description']}\n"
+            event_text += f"**Event ID:** {event.get('id')}\n"
+            event_text += f"**ETag:** {event.get('etag')}"
+            
+            return [types.TextContent(type="text", text=event_text)]
+        
         elif name == "update_event":
             event_id = arguments.pop('event_id')
             calendar_id = arguments.pop('calendar_id', 'primary')
+            etag = arguments.pop('etag', None)
             
             # Build update data
             event_data = {}
@@ -495,11 +1509,11 @@ async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent
             if arguments.get('end_time'):
                 event_data['end'] = {'dateTime': arguments['end_time'], 'timeZone': 'UTC'}
             
-            event = google_client.update_event(event_id, calendar_id, **event_data)
+            event = google_client.update_event(event_id, calendar_id, etag=etag, **event_data)
             
             return [types.TextContent(
                 type="text", 
-                text=f"✅ Event updated successfully!\n\n**{event.get('summary')}**\nEvent ID: {event.get('id')}"
+                text=f"✅ Event updated successfully!\n\n**{event.get('summary')}**\nEvent ID: {event.get('id')}\nETag: {event.get('etag')}"
             )]
         
         elif name == "delete_event":
@@ -526,10 +1540,51 @@ async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent
             
             return [types.TextContent(type="text", text=calendars_text)]
         
+        elif name == "find_conflicts":
+            output_format = arguments.pop('output_format', 'markdown')
+            result = google_client.find_conflicts(**arguments)
+            entries = result['events']
+            
+            def describe(index: int) -> Dict[str, Any]:
+                calendar_id, event = entries[index]
+                return dict(compact_event(event), calendar_id=calendar_id)
+            
+            if output_format == 'json':
+                return [types.TextContent(type="text", text=json.dumps({
+                    'events_checked': len(entries),
+                    'pairs': [[describe(a)['id'], describe(b)['id']] for a, b in result['pairs']],
+                    'clusters': [[describe(index) for index in cluster] for cluster in result['clusters']]
+                }, separators=(',', ':'), ensure_ascii=False))]
+            
+            conflicts_text = f"⚠️ **Calendar Conflicts** ({len(entries)} events checked)\n\n"
+            if not result['clusters']:
+                conflicts_text += "No conflicts found."
+            else:
+                conflicts_text += f"{len(result['pairs'])} overlapping pairs in {len(result['clusters'])} clusters\n\n"
+                for number, cluster in enumerate(result['clusters'], 1):
+                    conflicts_text += f"**Conflict {number}**\n"
+                    for index in cluster:
+                        event = describe(index)
+                        conflicts_text += f"• **{event['summary']}** ({event['calendar_id']})\n"
+                        conflicts_text += f"  📅 {event['start']} → {event['end']}\n"
+                        conflicts_text += f"  🆔 {event['id']}\n"
+                    conflicts_text += "\n"
+            
+            return [types.TextContent(type="text", text=conflicts_text)]
+        
         elif name == "list_messages":
             query = arguments.get('query', '')
             max_results = arguments.get('max_results', 10)
-            messages = google_client.list_messages(query=query, max_results=max_results)
+            output_format = arguments.get('output_format', 'markdown')
+            scope = {'tool': name, 'account': account, 'query': query, 'max_results': max_results}
+            position = decode_cursor(arguments.get('cursor'), scope)
+            messages, next_token = google_client.list_messages(
+                query=query, max_results=max_results, page_token=position.get('page_token')
+            )
+            next_cursor = encode_cursor(scope, page_token=next_token) if next_token else None
+            
+            if output_format == 'json':
+                return [types.TextContent(type="text", text=json_page('messages', [compact_message(m) for m in messages], next_cursor))]
             
             messages_text = "📧 **Gmail Messages**\n\n"
             if not messages:
@@ -545,6 +1600,8 @@ async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent
                     messages_text += f"  👤 {sender}\n"
                     messages_text += f"  📅 {date}\n"
                     messages_text += f"  🆔 {msg.get('id')}\n\n"
+            if next_cursor:
+                messages_text += f"➡️ More messages available. Next cursor: {next_cursor}"
             
             return [types.TextContent(type="text", text=messages_text)]
         
@@ -558,19 +1615,7 @@ async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent
             date = headers.get('Date', 'Unknown date')
             
             # Extract message body
-            body = ""
-            payload = message.get('payload', {})
-            if 'parts' in payload:
-                for part in payload['parts']:
-                    if part.get('mimeType') == 'text/plain':
-                        data = part.get('body', {}).get('data', '')
-                        if data:
-                            body = base64.urlsafe_b64decode(data).decode('utf-8')
-                            break
-            elif payload.get('mimeType') == 'text/plain':
-                data = payload.get('body', {}).get('data', '')
-                if data:
-                    body = base64.urlsafe_b64decode(data).decode('utf-8')
+            body = message_body_text(message)
             
             message_text = f"📧 **{subject}**\n\n"
             message_text += f"**From:** {sender}\n"
@@ -585,18 +1630,26 @@ async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent
             subject = arguments['subject']
             body = arguments['body']
             body_type = arguments.get('body_type', 'plain')
+            attachments = arguments.get('attachments') or []
             
-            sent_message = google_client.send_message(to, subject, body, body_type)
+            sent_message = google_client.send_message(to, subject, body, body_type, attachments)
             
-            return [types.TextContent(
-                type="text",
-                text=f"✅ Email sent successfully!\n\n**To:** {to}\n**Subject:** {subject}\n**Message ID:** {sent_message.get('id')}"
-            )]
+            sent_text = f"✅ Email sent successfully!\n\n**To:** {to}\n**Subject:** {subject}\n**Message ID:** {sent_message.get('id')}"
+            if attachments:
+                sent_text += f"\n**Attachments:** {', '.join(os.path.basename(path) for path in attachments)}"
+            return [types.TextContent(type="text", text=sent_text)]
         
         elif name == "search_messages":
             query = arguments['query']
             max_results = arguments.get('max_results', 20)
-            messages = google_client.search_messages(query, max_results)
+            output_format = arguments.get('output_format', 'markdown')
+            scope = {'tool': name, 'account': account, 'query': query, 'max_results': max_results}
+            position = decode_cursor(arguments.get('cursor'), scope)
+            messages, next_token = google_client.search_messages(query, max_results, position.get('page_token'))
+            next_cursor = encode_cursor(scope, page_token=next_token) if next_token else None
+            
+            if output_format == 'json':
+                return [types.TextContent(type="text", text=json_page('messages', [compact_message(m) for m in messages], next_cursor))]
             
             search_text = f"🔍 **Search Results for:** {query}\n\n"
             if not messages:
@@ -612,18 +1665,198 @@ async def handle_call_tool(name: str, arguments: dict) -> List[types.TextContent
                     search_text += f"  👤 {sender}\n"
                     search_text += f"  📅 {date}\n"
                     search_text += f"  🆔 {msg.get('id')}\n\n"
+            if next_cursor:
+                search_text += f"➡️ More results available. Next cursor: {next_cursor}"
             
             return [types.TextContent(type="text", text=search_text)]
         
+        elif name == "modify_messages":
+            if not arguments.get('message_ids') and not arguments.get('query'):
+                raise Exception("Give message_ids or a query")
+            counts = google_client.modify_messages(**arguments)
+            
+            partial = counts['failed'] or counts['truncated']
+            modify_text = "⚠️ **Labels partly updated**\n\n" if partial else "🏷️ **Labels updated**\n\n"
+            modify_text += f"**Messages changed:** {counts['modified']}\n"
+            modify_text += f"**API requests:** {counts['requests']}\n"
+            if counts['failed']:
+                modify_text += f"**Messages not changed:** {counts['failed']} ({counts['failed_requests']} failed requests)\n"
+                modify_text += f"**First error:** {counts['errors'][0]}\n"
+            if counts['truncated']:
+                modify_text += (f"**More messages match the query:** only the first "
+                                f"{arguments.get('max_messages', 5000)} were included; raise max_messages or run it again\n")
+            if arguments.get('add_labels'):
+                modify_text += f"**Added:** {', '.join(arguments['add_labels'])}\n"
+            if arguments.get('remove_labels'):
+                modify_text += f"**Removed:** {', '.join(arguments['remove_labels'])}\n"
+            
+            return [types.TextContent(type="text", text=modify_text)]
+        
+        elif name == "extract_todos_from_email":
+            dry_run = arguments.get('dry_run', False)
+            result = EmailTodoPipeline(google_client).run(**arguments)
+            
+            extract_text = "📋 **Todos from Email**" + (" (dry run)" if dry_run else "") + "\n\n"
+            extract_text += f"**Messages scanned:** {result['scanned']}\n"
+            extract_text += f"**Action candidates:** {result['candidates']}\n"
+            extract_text += f"**Duplicates skipped:** {result['duplicates']}\n"
+            if result['failed']:
+                extract_text += f"**Could not extract:** {', '.join(result['failed'])}\n"
+            extract_text += f"**Todos {'to add' if dry_run else 'added'}:** {len(result['added'])}\n\n"
+            for row in result['added']:
+                extract_text += f"• **{row['Task']}** ({row['Urgency']})\n"
+                extract_text += f"  📅 {row['Start Date']} → {row['End Date'] or 'no due date'}\n"
+            
+            return [types.TextContent(type="text", text=extract_text)]
+        
+        elif name == "list_attachments":
+            message_id = arguments['message_id']
+            attachments = google_client.list_attachments(message_id)
+            
+            attachments_text = f"📎 **Attachments for:** {message_id}\n\n"
+            if not attachments:
+                attachments_text += "No attachments found."
+            else:
+                for attachment in attachments:
+                    attachments_text += f"• **{attachment['filename']}**\n"
+                    attachments_text += f"  📄 {attachment['mime_type']}, {attachment['size']} bytes\n"
+                    attachments_text += f"  🆔 Part ID: {attachment['part_id']}\n\n"
+            
+            return [types.TextContent(type="text", text=attachments_text)]
+        
+        elif name == "download_attachment":
+            message_id = arguments['message_id']
+            part_id = arguments.get('part_id')
+            directory = arguments.get('directory', ATTACHMENTS_DIR)
+            results = google_client.download_attachments(message_id, part_id, directory)
+            
+            download_text = f"📎 **Downloaded to:** {directory}\n\n"
+            if not results:
+                download_text += "No attachments found."
+            else:
+                for entry in results:
+                    status = "⏭️ already downloaded" if entry['skipped'] else "✅ downloaded"
+                    download_text += f"• **{entry['filename']}** ({entry['size']} bytes) {status}\n"
+                    download_text += f"  🔒 sha256 {entry['sha256']}\n\n"
+            
+            return [types.TextContent(type="text", text=download_text)]
+        
+        elif name == "list_threads":
+            query = arguments.get('query', '')
+            max_results = arguments.get('max_results', 10)
+            threads = google_client.list_threads(query=query, max_results=max_results)
+            
+            threads_text = "🧵 **Gmail Threads**\n\n"
+            if not threads:
+                threads_text += "No threads found."
+            else:
+                for thread in threads:
+                    summary = summarize_thread(thread)
+                    threads_text += f"• **{summary['subject']}** ({summary['count']} messages)\n"
+                    threads_text += f"  👥 {', '.join(summary['participants'])}\n"
+                    threads_text += f"  ↪️ {summary['last_from']} — {summary['last_date']}\n"
+                    if summary['last_snippet']:
+                        threads_text += f"  💬 {summary['last_snippet'][:100]}\n"
+                    threads_text += f"  🆔 {summary['id']}\n\n"
+            
+            return [types.TextContent(type="text", text=threads_text)]
+        
+        elif name == "get_thread":
+            thread_id = arguments['thread_id']
+            thread = google_client.get_thread(thread_id)
+            summary = summarize_thread(thread)
+            
+            thread_text = f"🧵 **{summary['subject']}**\n\n"
+            thread_text += f"**Participants:** {', '.join(summary['participants'])}\n"
+            thread_text += f"**Messages:** {summary['count']}\n"
+            thread_text += f"**Thread ID:** {thread_id}\n\n"
+            for msg in thread.get('messages', []):
+                headers = {h['name']: h['value'] for h in msg.get('payload', {}).get('headers', [])}
+                thread_text += f"• 👤 {headers.get('From', 'Unknown sender')}\n"
+                thread_text += f"  📅 {headers.get('Date', 'Unknown date')}\n"
+                thread_text += f"  💬 {msg.get('snippet', '')}\n"
+                thread_text += f"  🆔 {msg.get('id')}\n\n"
+            
+            return [types.TextContent(type="text", text=thread_text)]
+        
+        elif name == "request_stats":
+            stats = google_client.single_flight.stats()
+            calls = sum(counters['calls'] for counters in stats.values())
+            shared = sum(counters['shared'] for counters in stats.values())
+            
+            stats_text = "📊 **Request Coalescing**\n\n"
+            stats_text += f"{calls} calls, {shared} served by an in-flight request\n\n"
+            busiest = sorted(stats.items(), key=lambda item: item[1]['shared'], reverse=True)
+            for key, counters in busiest[:20]:
+                stats_text += f"• `{key}`\n"
+                stats_text += (f"  calls {counters['calls']}, executed {counters['executed']}, "
+                               f"shared {counters['shared']}, errors {counters['errors']}\n")
+            
+            return [types.TextContent(type="text", text=stats_text)]
+        
         else:
             return [types.TextContent(type="text", text=f"Unknown tool: {name}")]
     
     except Exception as e:
         return [types.TextContent(type="text", text=f"Error: {str(e)}")]
 
-def main():
-    """Run the MCP server"""
-    import asyncio
+# Default address for the network transports (localhost only)
+HTTP_HOST = '127.0.0.1'
+HTTP_PORT = 8000
+
+# Host header values always accepted by the network transports
+LOOPBACK_HOSTS = ['127.0.0.1', 'localhost', '[::1]']
+
+def is_loopback(host: str) -> bool:
+    """Whether a bind address only accepts connections from this machine"""
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host.strip('[]')).is_loopback
+    except ValueError:
+        return False
+
+def transport_security(host: str):
+    """DNS rebinding protection: only accept our own Host and Origin headers
+    
+    Extra host names (e.g. behind a proxy) can be listed, comma separated, in
+    MCP_ALLOWED_HOSTS.
+    """
+    from mcp.server.transport_security import TransportSecuritySettings
+    
+    hosts = list(LOOPBACK_HOSTS)
+    if not is_loopback(host) and host not in ('0.0.0.0', '::'):
+        hosts.append(f"[{host}]" if ':' in host else host)
+    hosts.extend(name.strip() for name in os.environ.get('MCP_ALLOWED_HOSTS', '').split(',') if name.strip())
+    return TransportSecuritySettings(
+        enable_dns_rebinding_protection=True,
+        allowed_hosts=hosts + [f"{name}:*" for name in hosts],
+        allowed_origins=[f"{scheme}://{name}{port}" for scheme in ('http', 'https')
+                         for name in hosts for port in ('', ':*')]
+    )
+
+def require_token(asgi_app, token: Optional[str]):
+    """Wrap an ASGI app so HTTP requests need "Authorization: Bearer <token>" """
+    if not token:
+        return asgi_app
+    from starlette.responses import Response
+    
+    expected = f"Bearer {token}".encode('utf-8')
+    
+    async def guarded(scope, receive, send):
+        if scope['type'] == 'http':
+            supplied = dict(scope['headers']).get(b'authorization', b'')
+            if not hmac.compare_digest(supplied, expected):
+                response = Response("Unauthorized", status_code=401,
+                                    headers={'WWW-Authenticate': 'Bearer'})
+                await response(scope, receive, send)
+                return
+        await asgi_app(scope, receive, send)
+    
+    return guarded
+
+def run_stdio():
+    """Serve a single session over stdin/stdout"""
     from mcp.server.stdio import stdio_server
     
     async def run():
@@ -636,5 +1869,88 @@ def main():
     
     asyncio.run(run())
 
+def run_streamable_http(host: str, port: int, token: Optional[str] = None):
+    """Serve many concurrent sessions over streamable HTTP at /mcp
+    
+    All sessions share this process's client pool and caches.
+    """
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+    from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+    
+    session_manager = StreamableHTTPSessionManager(app=app, security_settings=transport_security(host))
+    
+    async def handle_mcp(scope, receive, send):
+        await session_manager.handle_request(scope, receive, send)
+    
+    @contextlib.asynccontextmanager
+    async def lifespan(starlette_app):
+        async with session_manager.run():
+            yield
+    
+    starlette_app = Starlette(routes=[Mount("/mcp", app=handle_mcp)], lifespan=lifespan)
+    uvicorn.run(require_token(starlette_app, token), host=host, port=port)
+
+def run_sse(host: str, port: int, token: Optional[str] = None):
+    """Serve many concurrent sessions over SSE at /sse (for older clients)"""
+    import uvicorn
+    from starlette.applications import Starlette
+    from starlette.responses import Response
+    from starlette.routing import Mount, Route
+    from mcp.server.sse import SseServerTransport
+    
+    sse = SseServerTransport("/messages/", security_settings=transport_security(host))
+    
+    async def handle_sse(request):
+        async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+        return Response()
+    
+    starlette_app = Starlette(routes=[
+        Route("/sse", endpoint=handle_sse, methods=["GET"]),
+        Mount("/messages/", app=sse.handle_post_message)
+    ])
+    uvicorn.run(require_token(starlette_app, token), host=host, port=port)
+
+def main():
+    """Run the MCP server"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Google Calendar and Gmail MCP server")
+    parser.add_argument('--transport', choices=['stdio', 'http', 'sse'],
+                        default=os.environ.get('MCP_TRANSPORT', 'stdio'),
+                        help="stdio (one session per process) or http/sse (one warm process for many sessions)")
+    parser.add_argument('--host', default=os.environ.get('MCP_HOST', HTTP_HOST))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('MCP_PORT', HTTP_PORT)))
+    parser.add_argument('--enroll', metavar='ACCOUNT',
+                        help="sign in a named account (creates accounts/ACCOUNT.json) and exit")
+    args = parser.parse_args()
+    
+    if args.enroll:
+        token_file = ClientPool.token_file(args.enroll)
+        GoogleServicesClient(token_file)
+        print(f"Account {args.enroll} enrolled ({token_file})")
+        return
+    
+    if args.transport == 'stdio':
+        run_stdio()
+        return
+    
+    token = os.environ.get('MCP_AUTH_TOKEN')
+    if not is_loopback(args.host) and not token:
+        parser.error(f"--host {args.host} accepts remote connections; set MCP_AUTH_TOKEN to require a bearer token")
+    
+    # Authenticate once up front so the first session doesn't pay for it
+    client_pool.get()
+    if args.transport == 'http':
+        run_streamable_http(args.host, args.port, token)
+    else:
+        run_sse(args.host, args.port, token)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
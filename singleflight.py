@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Single-flight request coalescing
+Concurrent identical calls (same method and normalized arguments) share one
+in-flight execution: the first caller runs it, the others wait for its
+result or exception. Per-key counters show how many calls were saved.
+"""
+
+import functools
+import inspect
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict
+
+# Keys whose counters are kept (least recently used keys are dropped)
+STATS_SIZE = 512
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls by key"""
+
+    def __init__(self, stats_size: int = STATS_SIZE):
+        self.stats_size = stats_size
+        self._calls: Dict[str, _Call] = {}
+        self._stats: 'OrderedDict[str, Dict[str, int]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, field: str):
+        """Bump a counter for key (caller holds the lock)"""
+        counters = self._stats.get(key)
+        if counters is None:
+            counters = {'calls': 0, 'executed': 0, 'shared': 0, 'errors': 0}
+            self._stats[key] = counters
+            while len(self._stats) > self.stats_size:
+                self._stats.popitem(last=False)
+        self._stats.move_to_end(key)
+        counters[field] += 1
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn, or wait for an identical in-flight call and share its outcome
+
+        Waiters get the same result object, which callers must not mutate.
+        """
+        with self._lock:
+            self._count(key, 'calls')
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self._count(key, 'executed')
+            else:
+                self._count(key, 'shared')
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            with self._lock:
+                self._count(key, 'errors')
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Counters per key: calls, executed, shared (saved round trips) and errors"""
+        with self._lock:
+            return {key: dict(counters) for key, counters in self._stats.items()}
+
+
+def coalesced(method: Callable) -> Callable:
+    """Coalesce concurrent identical calls of a client method
+
+    The owning object needs a `single_flight` attribute. Arguments are bound
+    to the signature with defaults applied, so positional and keyword forms
+    of the same call share a key.
+    """
+    signature = inspect.signature(method)
+    owner = next(iter(signature.parameters))
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        bound = signature.bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = {name: value for name, value in bound.arguments.items() if name != owner}
+        key = f"{method.__name__}:{json.dumps(arguments, sort_keys=True, default=str)}"
+        return self.single_flight.do(key, lambda: method(self, *args, **kwargs))
+
+    return wrapper
@@ -0,0 +1,111 @@
+import base64
+import email
+import email.policy
+import io
+import json
+import os
+
+import pytest
+
+from attachments import AttachmentStore, decode_data_field, write_mime_message
+
+PAYLOAD = bytes(range(256)) * 3 + b'tail'
+
+
+def _response(data: bytes) -> bytes:
+    encoded = base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+    return json.dumps({'size': len(data), 'data': encoded}).encode('ascii')
+
+
+def _chunks(raw: bytes, size: int):
+    return [raw[i:i + size] for i in range(0, len(raw), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 7, 64, 10_000])
+def test_decode_across_chunk_boundaries(size):
+    out = []
+
+    total = decode_data_field(_chunks(_response(PAYLOAD), size), out.append)
+
+    assert b''.join(out) == PAYLOAD
+    assert total == len(PAYLOAD)
+
+
+def test_decode_splits_the_marker_and_opening_quote():
+    raw = _response(b'hello world')
+    index = raw.index(b'"data"')
+    chunks = [raw[:index + 3], raw[index + 3:index + 8], raw[index + 8:]]
+    out = []
+
+    decode_data_field(chunks, out.append)
+
+    assert b''.join(out) == b'hello world'
+
+
+def _attachment(data: bytes, part_id='1', filename='report.pdf', size=None):
+    return {'part_id': part_id, 'filename': filename, 'mime_type': 'application/pdf',
+            'size': len(data) if size is None else size,
+            'data': base64.urlsafe_b64encode(data).decode('ascii')}
+
+
+def test_size_mismatch_is_rejected_without_leftovers(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+
+    with pytest.raises(ValueError, match='expected 99'):
+        store.save('m1', _attachment(b'short', size=99))
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_existing_download_is_found_by_hash(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+    entry = store.save('m1', _attachment(PAYLOAD))
+
+    assert AttachmentStore(str(tmp_path)).existing('m1:1') == entry
+    with open(tmp_path / entry['filename'], 'ab') as file:
+        file.write(b'changed')
+    assert store.existing('m1:1') is None
+
+
+def test_same_filename_from_another_message_is_renamed(tmp_path):
+    store = AttachmentStore(str(tmp_path))
+
+    first = store.save('m1', _attachment(b'one'))
+    second = store.save('m2', _attachment(b'two'))
+    again = store.save('m1', _attachment(b'one'))
+
+    assert first['filename'] == 'report.pdf'
+    assert second['filename'] == 'm2_report.pdf'
+    assert again['filename'] == 'report.pdf'
+    assert (tmp_path / 'm2_report.pdf').read_bytes() == b'two'
+    assert sorted(os.listdir(tmp_path)) == ['.attachments.json', 'm2_report.pdf', 'report.pdf']
+
+
+def test_mime_message_round_trip(tmp_path):
+    binary = tmp_path / 'data.bin'
+    binary.write_bytes(PAYLOAD * 200)
+    notes = tmp_path / 'notizen-ü.txt'
+    notes.write_text('first line\nsecond line\n', encoding='utf-8')
+    out = io.BytesIO()
+
+    written = write_mime_message(out, 'someone@example.com', 'Quarterly report ✓', '<p>Hi</p>',
+                                 'html', [str(binary), str(notes)])
+
+    raw = out.getvalue()
+    assert written == len(raw)
+    message = email.message_from_bytes(raw, policy=email.policy.default)
+    assert message['To'] == 'someone@example.com'
+    assert message['Subject'] == 'Quarterly report ✓'
+    body, first, second = message.iter_parts()
+    assert body.get_content_type() == 'text/html'
+    assert body.get_content().strip() == '<p>Hi</p>'
+    assert first.get_filename() == 'data.bin'
+    assert first.get_content_type() == 'application/octet-stream'
+    assert first.get_payload(decode=True) == PAYLOAD * 200
+    assert second.get_filename() == 'notizen-ü.txt'
+    assert second.get_payload(decode=True) == b'first line\nsecond line\n'
+
+
+def test_missing_attachment_path_is_rejected(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        write_mime_message(io.BytesIO(), 'a@example.com', 's', 'b', 'plain', [str(tmp_path / 'nope')])
@@ -0,0 +1,50 @@
+from attachments import without_attachment_data
+from cache import LRUCache, approximate_size
+
+
+def test_entry_bound_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+
+    assert list(cache.keys()) == ['a', 'c']
+
+
+def test_byte_bound_evicts_until_under_budget():
+    value = 'x' * 100
+    cache = LRUCache(max_entries=100, max_bytes=3 * approximate_size(value))
+    for key in range(5):
+        cache.put(key, value)
+
+    assert list(cache.keys()) == [2, 3, 4]
+    assert cache.size == 3 * approximate_size(value)
+    cache.pop(3)
+    assert cache.size == 2 * approximate_size(value)
+
+
+def test_oversized_entry_is_not_kept():
+    cache = LRUCache(max_entries=10, max_bytes=50)
+    cache.put('small', 'ok')
+    cache.put('large', 'x' * 100)
+
+    assert 'large' not in cache
+    assert cache.get('small') == 'ok'
+
+
+def test_cached_message_copy_drops_attachment_data_only():
+    message = {'id': 'm1', 'payload': {'mimeType': 'multipart/mixed', 'parts': [
+        {'mimeType': 'text/plain', 'body': {'data': 'SGVsbG8'}},
+        {'mimeType': 'image/png', 'filename': 'a.png', 'body': {'data': 'iVBORw0', 'size': 5}},
+    ]}}
+
+    stripped = without_attachment_data(message)
+
+    text, image = stripped['payload']['parts']
+    assert text['body'] == {'data': 'SGVsbG8'}
+    assert image['body'] == {'size': 5}
+    assert stripped['_attachment_data_dropped']
+    assert message['payload']['parts'][1]['body']['data'] == 'iVBORw0'
+    plain = {'id': 'm2', 'payload': {'mimeType': 'text/plain', 'body': {'data': 'SGk'}}}
+    assert without_attachment_data(plain) is plain
@@ -0,0 +1,62 @@
+from datetime import datetime, timezone
+
+from conflicts import event_interval, find_conflicts, find_overlaps
+
+
+def _at(hour, minute=0):
+    return datetime(2026, 10, 19, hour, minute, tzinfo=timezone.utc)
+
+
+def _event(event_id, start, end, **extra):
+    event = {'id': event_id,
+             'start': {'dateTime': f'2026-10-19T{start}:00Z'},
+             'end': {'dateTime': f'2026-10-19T{end}:00Z'}}
+    event.update(extra)
+    return event
+
+
+def test_overlapping_intervals_form_pairs_and_clusters():
+    intervals = [(_at(9), _at(10)), (_at(9, 30), _at(11)), (_at(10, 30), _at(12)), (_at(13), _at(14))]
+
+    pairs, clusters = find_overlaps(intervals)
+
+    assert sorted(pairs) == [(0, 1), (1, 2)]
+    assert clusters == [[0, 1, 2]]
+
+
+def test_back_to_back_intervals_do_not_conflict():
+    pairs, clusters = find_overlaps([(_at(9), _at(10)), (_at(10), _at(11))])
+
+    assert pairs == []
+    assert clusters == []
+
+
+def test_events_that_cannot_conflict_are_skipped():
+    declined = _event('a', '09:00', '10:00',
+                      attendees=[{'email': 'me@example.com', 'self': True, 'responseStatus': 'declined'}])
+
+    assert event_interval(declined) is None
+    assert event_interval(_event('b', '09:00', '10:00', transparency='transparent')) is None
+    assert event_interval(_event('c', '09:00', '10:00', status='cancelled')) is None
+    assert event_interval(_event('d', '10:00', '10:00')) is None
+    assert event_interval(_event('e', '09:00', '10:00')) == (_at(9), _at(10))
+
+
+def test_find_conflicts_dedupes_shared_meetings_across_calendars():
+    shared = _event('shared', '09:00', '10:00', iCalUID='uid-1')
+    result = find_conflicts({
+        'work': ([shared, _event('review', '09:30', '10:30')], 'UTC'),
+        'team': ([dict(shared, id='shared-copy')], 'UTC'),
+    })
+
+    assert [(calendar, event['id']) for calendar, event in result['events']] == [('work', 'shared'),
+                                                                                 ('work', 'review')]
+    assert result['pairs'] == [(0, 1)]
+
+
+def test_all_day_events_are_opt_in():
+    holiday = {'id': 'holiday', 'start': {'date': '2026-10-19'}, 'end': {'date': '2026-10-20'}}
+    events = {'work': ([holiday, _event('review', '09:00', '10:00')], 'UTC')}
+
+    assert find_conflicts(events)['pairs'] == []
+    assert find_conflicts(events, include_all_day=True)['pairs'] == [(0, 1)]
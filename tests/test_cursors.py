@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+import server
+from server import decode_cursor, encode_cursor
+
+SCOPE = {'tool': 'list_events', 'calendar_id': 'primary', 'time_min': '2026-10-19T00:00:00Z'}
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor(SCOPE, page_token='abc', offset=3)
+
+    assert '=' not in cursor
+    position = decode_cursor(cursor, dict(reversed(list(SCOPE.items()))))
+    assert position['page_token'] == 'abc'
+    assert position['offset'] == 3
+
+
+def test_empty_cursor_starts_from_the_beginning():
+    assert decode_cursor(None, SCOPE) == {}
+    assert decode_cursor('', SCOPE) == {}
+
+
+def test_cursor_from_another_query_is_rejected():
+    cursor = encode_cursor(SCOPE, offset=3)
+
+    with pytest.raises(Exception, match='does not match'):
+        decode_cursor(cursor, dict(SCOPE, calendar_id='work'))
+
+
+def test_garbled_cursor_is_rejected():
+    with pytest.raises(Exception, match='Invalid cursor'):
+        decode_cursor('not a cursor!', SCOPE)
+
+
+class FakeClient:
+    def list_messages(self, query='', max_results=10, page_token=None):
+        return [], 'next-page'
+
+
+class FakePool:
+    def get(self, account=None):
+        return FakeClient()
+
+
+def test_cursor_is_bound_to_the_account(monkeypatch):
+    monkeypatch.setattr(server, 'client_pool', FakePool())
+    arguments = {'query': 'is:unread', 'output_format': 'json'}
+
+    page = json.loads(server._call_tool('list_messages', dict(arguments, account='alice'))[0].text)
+    same = server._call_tool('list_messages', dict(arguments, account='alice', cursor=page['next_cursor']))
+    other = server._call_tool('list_messages', dict(arguments, account='bob', cursor=page['next_cursor']))
+
+    assert json.loads(same[0].text)['next_cursor']
+    assert 'does not match' in other[0].text
@@ -0,0 +1,151 @@
+import base64
+from datetime import datetime
+
+from email_todos import EmailTodoPipeline, extract_due_date
+
+REFERENCE = datetime(2026, 10, 19, 9, 0)
+
+
+def test_cued_due_date():
+    assert extract_due_date("Report due 2026-11-02", REFERENCE) == '2026-11-02'
+    assert extract_due_date("Please send it by Nov 5", REFERENCE) == '2026-11-05'
+
+
+def test_cued_date_without_year_rolls_to_next_year():
+    assert extract_due_date("Budget due March 3", REFERENCE) == '2027-03-03'
+
+
+def test_cued_date_with_year_is_kept():
+    assert extract_due_date("This was due 2025-01-01", REFERENCE) == '2025-01-01'
+
+
+def test_leap_day_rolls_over_to_a_valid_date():
+    assert extract_due_date("Report due Feb 29", datetime(2028, 3, 5)) == '2029-02-28'
+
+
+def test_uncued_past_dates_are_ignored():
+    assert extract_due_date("Following up on our Oct 3 meeting, please review", REFERENCE) is None
+    assert extract_due_date("We met on 3/10", REFERENCE) is None
+
+
+def test_uncued_future_date_is_used():
+    assert extract_due_date("Launch review on Dec 1", REFERENCE) == '2026-12-01'
+
+
+def test_cued_date_preferred_over_earlier_uncued_date():
+    text = "After the Nov 2 kickoff, the draft is due Nov 20"
+    assert extract_due_date(text, REFERENCE) == '2026-11-20'
+
+
+class _Request:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeGmail:
+    """messages().list over an in-memory mailbox, newest first, with after:"""
+
+    def __init__(self, mailbox):
+        self.mailbox = mailbox
+
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def list(self, userId, q, maxResults, pageToken=None):
+        after = 0
+        for term in q.split():
+            if term.startswith('after:'):
+                after = int(term[len('after:'):])
+        matches = sorted((m for m in self.mailbox if m['internalDate'] // 1000 >= after),
+                         key=lambda m: m['internalDate'], reverse=True)
+        start = int(pageToken or 0)
+        page = matches[start:start + maxResults]
+        result = {'messages': [{'id': m['id']} for m in page]}
+        if start + maxResults < len(matches):
+            result['nextPageToken'] = str(start + maxResults)
+        return _Request(result)
+
+
+class FakeClient:
+    token_file = 'accounts/test.json'
+
+    def __init__(self, mailbox):
+        self.mailbox = {m['id']: m for m in mailbox}
+        self.gmail_service = FakeGmail(mailbox)
+
+    def message_detail(self, message_id, format='full'):
+        message = self.mailbox[message_id]
+        headers = [{'name': 'Subject', 'value': message['subject']},
+                   {'name': 'Date', 'value': 'Mon, 19 Oct 2026 09:00:00 +0000'}]
+        payload = {'headers': headers}
+        if format == 'full':
+            data = base64.urlsafe_b64encode(b'Please handle this.').decode('ascii')
+            payload = dict(payload, mimeType='text/plain', body={'data': data})
+        return {'id': message_id, 'internalDate': str(message['internalDate']),
+                'snippet': 'Please handle this', 'payload': payload}
+
+
+def _mailbox(count, start=1_790_000_000_000, step=60_000):
+    return [{'id': f'm{i}', 'subject': f'Task number {i}', 'internalDate': start + i * step}
+            for i in range(count)]
+
+
+def _pipeline(tmp_path, mailbox):
+    return EmailTodoPipeline(FakeClient(mailbox), todo_file=str(tmp_path / 'todo.csv'),
+                             checkpoint_file=str(tmp_path / 'checkpoint.json'))
+
+
+def test_capped_runs_resume_without_skipping(tmp_path):
+    mailbox = _mailbox(5)
+    pipeline = _pipeline(tmp_path, mailbox)
+
+    added = []
+    for _ in range(3):
+        result = pipeline.run(max_messages=2)
+        added.extend(row['Task'] for row in result['added'])
+
+    assert added == [f'Task number {i}' for i in range(5)]
+    assert pipeline.run(max_messages=2)['scanned'] == 0
+
+
+def test_messages_in_the_checkpoint_second_are_not_repeated(tmp_path):
+    # Three messages within one second: after: returns all of them again
+    mailbox = _mailbox(3, step=100)
+    pipeline = _pipeline(tmp_path, mailbox)
+
+    first = pipeline.run(max_messages=2)
+    second = pipeline.run(max_messages=2)
+
+    assert [row['Task'] for row in first['added']] == ['Task number 0', 'Task number 1']
+    assert [row['Task'] for row in second['added']] == ['Task number 2']
+    assert second['scanned'] == 1
+
+
+def test_dry_run_keeps_checkpoint(tmp_path):
+    pipeline = _pipeline(tmp_path, _mailbox(2))
+
+    assert len(pipeline.run(dry_run=True)['added']) == 2
+    assert len(pipeline.run()['added']) == 2
+
+
+def test_failed_extraction_does_not_block_the_checkpoint(tmp_path):
+    pipeline = _pipeline(tmp_path, _mailbox(3))
+    extract = pipeline.extract
+
+    def flaky_extract(message):
+        if message['id'] == 'm1':
+            raise ValueError("unparseable")
+        return extract(message)
+
+    pipeline.extract = flaky_extract
+    result = pipeline.run()
+
+    assert result['failed'] == ['m1']
+    assert [row['Task'] for row in result['added']] == ['Task number 0', 'Task number 2']
+    assert pipeline.run()['scanned'] == 0
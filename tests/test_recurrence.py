@@ -0,0 +1,111 @@
+from recurrence import RecurrenceExpander
+
+
+def _weekly_standup(**extra):
+    master = {
+        'id': 'standup',
+        'etag': '"1"',
+        'summary': 'Standup',
+        'start': {'dateTime': '2026-10-19T09:00:00-04:00', 'timeZone': 'America/New_York'},
+        'end': {'dateTime': '2026-10-19T09:30:00-04:00', 'timeZone': 'America/New_York'},
+        'recurrence': ['RRULE:FREQ=WEEKLY;COUNT=4'],
+    }
+    master.update(extra)
+    return master
+
+
+def _expand(items, time_min='2026-10-01T00:00:00Z', time_max='2026-12-01T00:00:00Z', **kwargs):
+    return RecurrenceExpander().expand(items, time_min, time_max, **kwargs)
+
+
+def test_timed_instances_keep_local_time_across_dst():
+    instances = _expand([_weekly_standup()])
+
+    starts = [instance['start']['dateTime'] for instance in instances]
+    assert starts == ['2026-10-19T09:00:00-04:00', '2026-10-26T09:00:00-04:00',
+                      '2026-11-02T09:00:00-05:00', '2026-11-09T09:00:00-05:00']
+    assert instances[2]['end']['dateTime'] == '2026-11-02T09:30:00-05:00'
+    assert instances[2]['start']['timeZone'] == 'America/New_York'
+    assert [instance['id'] for instance in instances][1:3] == ['standup_20261026T130000Z',
+                                                               'standup_20261102T140000Z']
+    assert all(instance['recurringEventId'] == 'standup' for instance in instances)
+    assert all('recurrence' not in instance for instance in instances)
+
+
+def test_exdate_removes_an_instance():
+    master = _weekly_standup(recurrence=['RRULE:FREQ=WEEKLY;COUNT=4',
+                                         'EXDATE;TZID=America/New_York:20261026T090000'])
+
+    ids = [instance['id'] for instance in _expand([master])]
+
+    assert ids == ['standup_20261019T130000Z', 'standup_20261102T140000Z', 'standup_20261109T140000Z']
+
+
+def test_all_day_instances_use_dates():
+    master = {
+        'id': 'holiday',
+        'start': {'date': '2026-10-30'},
+        'end': {'date': '2026-10-31'},
+        'recurrence': ['RRULE:FREQ=DAILY;UNTIL=20261101'],
+    }
+
+    instances = _expand([master], calendar_tz='America/New_York')
+
+    assert [instance['id'] for instance in instances] == ['holiday_20261030', 'holiday_20261031',
+                                                          'holiday_20261101']
+    assert instances[0]['start'] == {'date': '2026-10-30'}
+    assert instances[0]['end'] == {'date': '2026-10-31'}
+    assert instances[0]['originalStartTime'] == {'date': '2026-10-30'}
+
+
+def test_exceptions_replace_their_occurrences():
+    moved = {
+        'id': 'standup_20261026T130000Z',
+        'recurringEventId': 'standup',
+        'originalStartTime': {'dateTime': '2026-10-26T09:00:00-04:00', 'timeZone': 'America/New_York'},
+        'start': {'dateTime': '2026-10-27T11:00:00-04:00'},
+        'end': {'dateTime': '2026-10-27T11:30:00-04:00'},
+    }
+    cancelled = {
+        'id': 'standup_20261102T140000Z',
+        'recurringEventId': 'standup',
+        'status': 'cancelled',
+        'originalStartTime': {'dateTime': '2026-11-02T09:00:00-05:00', 'timeZone': 'America/New_York'},
+    }
+
+    instances = _expand([_weekly_standup(), moved, cancelled])
+
+    assert [instance['id'] for instance in instances] == ['standup_20261019T130000Z',
+                                                          'standup_20261026T130000Z',
+                                                          'standup_20261109T140000Z']
+    assert instances[1]['start']['dateTime'] == '2026-10-27T11:00:00-04:00'
+
+
+def test_max_results_and_window_limit_the_expansion():
+    master = _weekly_standup(recurrence=['RRULE:FREQ=WEEKLY'])
+
+    assert len(_expand([master], max_results=3)) == 3
+    later = _expand([master], time_min='2026-11-01T00:00:00Z', time_max='2026-11-15T00:00:00Z')
+    assert [instance['start']['dateTime'] for instance in later] == ['2026-11-02T09:00:00-05:00',
+                                                                     '2026-11-09T09:00:00-05:00']
+
+
+def test_date_only_until_on_a_timed_rule_includes_that_day():
+    master = _weekly_standup(recurrence=['RRULE:FREQ=WEEKLY;UNTIL=20261102'])
+
+    ids = [instance['id'] for instance in _expand([master])]
+
+    assert ids == ['standup_20261019T130000Z', 'standup_20261026T130000Z', 'standup_20261102T140000Z']
+
+
+def test_utc_until_on_an_all_day_rule_uses_its_date():
+    master = {
+        'id': 'holiday',
+        'start': {'date': '2026-10-30'},
+        'end': {'date': '2026-10-31'},
+        'recurrence': ['RRULE:FREQ=DAILY;UNTIL=20261031T000000Z'],
+    }
+
+    ids = [instance['id'] for instance in _expand([master])]
+
+    assert ids == ['holiday_20261030', 'holiday_20261031']
@@ -0,0 +1,88 @@
+from shards import LIST_PAGE_SIZE, fetch_sharded, list_all_events, parse_rfc3339, split_window
+
+
+def test_narrow_window_is_one_shard():
+    window = ('2026-10-19T00:00:00Z', '2026-11-18T00:00:00Z')
+
+    assert split_window(*window) == [window]
+
+
+def test_wide_window_is_split_into_adjacent_shards():
+    time_min, time_max = '2026-01-01T00:00:00.250000Z', '2027-01-01T00:00:00Z'
+
+    shards = split_window(time_min, time_max)
+
+    assert len(shards) == 12
+    assert shards[0][0] == time_min
+    assert shards[-1][1] == time_max
+    assert all(shards[i][1] == shards[i + 1][0] for i in range(len(shards) - 1))
+    for _, bound in shards[:-1]:
+        assert parse_rfc3339(bound).microsecond == 0
+        assert parse_rfc3339(bound).utcoffset().total_seconds() == 0
+
+
+def test_naive_bounds_are_treated_as_utc():
+    assert parse_rfc3339('2026-10-19T09:00:00') == parse_rfc3339('2026-10-19T09:00:00Z')
+
+
+def test_fetch_sharded_dedupes_spanning_events_and_keeps_start_order():
+    # Overlaps at least one shard boundary, so several shards return it
+    spanning = {'id': 'spanning', 'start': {'dateTime': '2026-01-20T00:00:00Z'},
+                'end': {'dateTime': '2026-04-20T00:00:00Z'}}
+    calls = []
+
+    def fetch(time_min, time_max):
+        calls.append((time_min, time_max))
+        items = [{'id': f'first-{len(calls)}', 'start': {'dateTime': time_min}}]
+        if parse_rfc3339(time_min) < parse_rfc3339(spanning['end']['dateTime']) \
+                and parse_rfc3339(spanning['start']['dateTime']) < parse_rfc3339(time_max):
+            items.append(spanning)
+        return sorted(items, key=lambda item: parse_rfc3339(item['start']['dateTime'])), 'UTC'
+
+    items, calendar_tz = fetch_sharded(fetch, '2026-01-01T00:00:00Z', '2027-01-01T00:00:00Z')
+
+    ids = [item['id'] for item in items]
+    assert len(calls) == 12
+    assert calendar_tz == 'UTC'
+    assert ids.count('spanning') == 1
+    assert len(ids) == 13
+    starts = [parse_rfc3339(item['start']['dateTime']) for item in items]
+    assert starts == sorted(starts)
+
+
+class _Request:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class FakeCalendar:
+    """events().list over three pages, recording the request arguments"""
+
+    def __init__(self):
+        self.requests = []
+
+    def events(self):
+        return self
+
+    def list(self, **kwargs):
+        self.requests.append(kwargs)
+        page = int(kwargs['pageToken'] or 0)
+        result = {'items': [{'id': f'e{page}'}], 'timeZone': 'Europe/Berlin'}
+        if page < 2:
+            result['nextPageToken'] = str(page + 1)
+        return _Request(result)
+
+
+def test_list_all_events_follows_every_page():
+    calendar = FakeCalendar()
+
+    items, calendar_tz = list_all_events(calendar, calendarId='primary', singleEvents=True)
+
+    assert [item['id'] for item in items] == ['e0', 'e1', 'e2']
+    assert calendar_tz == 'Europe/Berlin'
+    assert [request['pageToken'] for request in calendar.requests] == [None, '1', '2']
+    assert all(request['maxResults'] == LIST_PAGE_SIZE and request['singleEvents']
+               for request in calendar.requests)
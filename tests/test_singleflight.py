@@ -0,0 +1,107 @@
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight, coalesced
+
+WAITERS = 5
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def _run_concurrently(flight, key, fn):
+    """Start a leader blocked in fn, join WAITERS callers, return (threads, outcomes)"""
+    outcomes = []
+    lock = threading.Lock()
+
+    def call():
+        try:
+            result = flight.do(key, fn)
+        except Exception as error:
+            result = error
+        with lock:
+            outcomes.append(result)
+
+    threads = [threading.Thread(target=call) for _ in range(WAITERS + 1)]
+    threads[0].start()
+    _wait_for(lambda: flight.stats().get(key, {}).get('executed') == 1)
+    for thread in threads[1:]:
+        thread.start()
+    _wait_for(lambda: flight.stats()[key]['shared'] == WAITERS)
+    return threads, outcomes
+
+
+def test_waiters_share_the_leaders_result():
+    flight = SingleFlight()
+    release = threading.Event()
+    runs = []
+
+    def fetch():
+        runs.append(1)
+        release.wait(5)
+        return {'value': 42}
+
+    threads, outcomes = _run_concurrently(flight, 'k', fetch)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(runs) == 1
+    assert len(outcomes) == WAITERS + 1
+    assert all(outcome is outcomes[0] for outcome in outcomes)
+    assert flight.stats()['k'] == {'calls': WAITERS + 1, 'executed': 1, 'shared': WAITERS, 'errors': 0}
+
+
+def test_waiters_get_the_leaders_error():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fetch():
+        release.wait(5)
+        raise ValueError("quota exceeded")
+
+    threads, outcomes = _run_concurrently(flight, 'k', fetch)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(outcomes) == WAITERS + 1
+    assert all(isinstance(outcome, ValueError) for outcome in outcomes)
+    assert flight.stats()['k']['errors'] == 1
+
+
+def test_later_calls_run_again():
+    flight = SingleFlight()
+
+    assert flight.do('k', lambda: 1) == 1
+    with pytest.raises(KeyError):
+        flight.do('k', lambda: {}['missing'])
+    assert flight.do('k', lambda: 3) == 3
+    assert flight.stats()['k'] == {'calls': 3, 'executed': 3, 'shared': 0, 'errors': 1}
+
+
+class Client:
+    def __init__(self):
+        self.single_flight = SingleFlight()
+
+    @coalesced
+    def message_detail(self, message_id, format='full'):
+        return (message_id, format)
+
+
+def test_positional_and_keyword_calls_share_a_key():
+    client = Client()
+    client.message_detail('m1')
+    client.message_detail('m1', 'full')
+    client.message_detail(message_id='m1', format='full')
+    client.message_detail('m1', format='metadata')
+
+    stats = client.single_flight.stats()
+    assert sorted(counters['calls'] for counters in stats.values()) == [1, 3]
+    assert all(key.startswith('message_detail:') for key in stats)
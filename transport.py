@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Thread-safe HTTP transport for the Google API clients
+httplib2.Http is not thread-safe, so every worker thread gets its own
+authorized client from the pool and keeps reusing it, which keeps the
+connection (and its TLS session) alive between calls on that thread
+"""
+
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import google_auth_httplib2
+import httplib2
+from google.auth.transport.requests import AuthorizedSession
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.http import HttpRequest
+
+# Socket timeout in seconds for API requests
+HTTP_TIMEOUT = 60
+
+# Worker threads for fanned-out API requests (time shards, batch chunks)
+API_WORKERS = 8
+
+# Parsed discovery documents, shared by every service built in this process
+_discovery_documents: Dict[Tuple[str, str], Dict[str, Any]] = {}
+_discovery_lock = threading.Lock()
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def discovery_document(service_name: str, version: str) -> Any:
+    """The parsed discovery document for an API, loaded once per process"""
+    key = (service_name, version)
+    with _discovery_lock:
+        document = _discovery_documents.get(key)
+        if document is None:
+            content = discovery_cache.get_static_doc(service_name, version)
+            if content is None:
+                return None
+            document = json.loads(content)
+            _discovery_documents[key] = document
+        return document
+
+
+def api_executor() -> ThreadPoolExecutor:
+    """The process-wide executor for concurrent API requests
+
+    Its threads live for the whole process, so each keeps its HttpPool
+    connections (and TLS sessions) between calls. Tasks must not wait on
+    other tasks submitted to it.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=API_WORKERS, thread_name_prefix='api')
+        return _executor
+
+
+class HttpPool:
+    """Per-thread authorized HTTP clients sharing one set of credentials"""
+
+    def __init__(self, credentials, timeout: int = HTTP_TIMEOUT):
+        self.credentials = credentials
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def http(self) -> google_auth_httplib2.AuthorizedHttp:
+        """The calling thread's keep-alive httplib2 client"""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=httplib2.Http(timeout=self.timeout)
+            )
+            self._local.http = http
+        return http
+
+    def session(self) -> AuthorizedSession:
+        """The calling thread's requests session, for raw streamed downloads"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = AuthorizedSession(self.credentials)
+            self._local.session = session
+        return session
+
+    def request_builder(self, http, *args, **kwargs) -> HttpRequest:
+        """requestBuilder for discovery services: run each request on the caller's client"""
+        return HttpRequest(self.http(), *args, **kwargs)
+
+    def build(self, service_name: str, version: str) -> Any:
+        """Build a discovery service whose requests are safe to execute from any thread
+
+        Services share one parsed discovery document, so extra accounts only
+        cost their own credentials and connections.
+        """
+        document = discovery_document(service_name, version)
+        if document is not None:
+            return build_from_document(document, http=self.http(),
+                                       requestBuilder=self.request_builder)
+        return build(service_name, version, http=self.http(),
+                     requestBuilder=self.request_builder, cache_discovery=False)